@@ -0,0 +1,137 @@
+"""
+Benchmark: Buchtyp-Erkennung (DOC_TYPES) alt gegen neu.
+
+Alt: match_doc_type aus parse_pf_metadata (drei lineare Durchläufe über
+DOC_TYPES mit Teilstring-Suche je Alias). Neu: main.classify_doc_type
+(einmal aufgebauter Muster-Index, LRU-Cache, Rückfall ohne diakritische
+Zeichen).
+
+Prüft zuerst, dass jeder Text, den der alte Ablauf erkannt hat, genauso
+eingeordnet wird (sonst Exit-Code 1); Texte, die nur der neue Ablauf
+erkennt (z.B. ohne Háčky geschrieben), werden aufgelistet. Danach
+Zeiten je Text: alt, neu ohne Cache, neu mit Cache.
+
+Aufruf:
+    python benchmarks/bench_doc_types.py [korpus.txt ...] [-n 200] [--out ergebnis.json]
+
+Ohne Dateien wird benchmarks/doc_types_corpus.txt benutzt.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import main  # noqa: E402
+
+
+def legacy_match_doc_type(primary_type):
+    """Alter Ablauf, unverändert aus parse_pf_metadata übernommen."""
+    text = primary_type.lower()
+
+    # 1. direktes Schlüsselwortmatching
+    for key, data in main.DOC_TYPES.items():
+        if key in text:
+            return data
+
+    # 2. Alias Matching
+    for key, data in main.DOC_TYPES.items():
+        if any(alias in text for alias in data["aliases"]):
+            return data
+
+    # 3. Sprach-Matching
+    for key, data in main.DOC_TYPES.items():
+        if data["cs"].lower() in text:
+            return data
+        if data["de"].lower() in text:
+            return data
+        if data["en"].lower() in text:
+            return data
+
+    # 4. Fallback
+    return {
+        "de": primary_type,
+        "cs": primary_type,
+        "en": primary_type
+    }
+
+
+def load_corpus(paths):
+    texts = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            texts.extend(line.strip() for line in f
+                         if line.strip() and not line.lstrip().startswith("#"))
+    return texts
+
+
+def per_call_us(fn, texts, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        for text in texts:
+            fn(text)
+        best = min(best, time.perf_counter() - t)
+    return best / len(texts) * 1e6
+
+
+def triplet(entry):
+    return entry["de"], entry["cs"], entry["en"]
+
+
+def run(args):
+    texts = load_corpus(args.corpus or [os.path.join(HERE, "doc_types_corpus.txt")])
+    uncached = main.classify_doc_type.__wrapped__
+
+    changed = []
+    newly = []
+    for text in texts:
+        old, new = legacy_match_doc_type(text), uncached(text)
+        old_known = any(old is d for d in main.DOC_TYPES.values())
+        if old_known and triplet(old) != triplet(new):
+            changed.append({"text": text, "old": triplet(old), "new": triplet(new)})
+        elif not old_known and triplet(old) != triplet(new):
+            newly.append({"text": text, "new": triplet(new)})
+
+    def cached(text):
+        return main.classify_doc_type(text)
+
+    main.classify_doc_type.cache_clear()
+    for text in texts:
+        cached(text)
+
+    return {
+        "corpus": len(texts),
+        "unchanged": len(texts) - len(changed) - len(newly),
+        "changed": changed,
+        "newly_classified": newly,
+        "us_per_text": {
+            "legacy": round(per_call_us(legacy_match_doc_type, texts, args.repeat), 3),
+            "indexed": round(per_call_us(uncached, texts, args.repeat), 3),
+            "indexed_cached": round(per_call_us(cached, texts, args.repeat), 3),
+        },
+        "python": sys.version.split()[0],
+    }
+
+
+def main_cli():
+    ap = argparse.ArgumentParser(description="Buchtyp-Erkennung: Gleichheit und Geschwindigkeit alt/neu")
+    ap.add_argument("corpus", nargs="*", help="Textdateien mit einem Buchtyp je Zeile")
+    ap.add_argument("-n", "--repeat", type=int, default=200)
+    ap.add_argument("--out", help="Ergebnis zusätzlich als JSON-Datei speichern")
+    args = ap.parse_args()
+
+    result = run(args)
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    print(text)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    sys.exit(1 if result["changed"] else 0)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,385 @@
+"""
+Benchmark: Parse-Zeit pro Buch (Linksuche + Metadaten).
+
+Vergleicht den alten Ablauf (find_iip_links und parse_pf_metadata
+unverändert aus dem Stand vor der Optimierung: je ein eigener
+html.parser-Baum, Ort-Suche per get_text() über alle Tags, eine
+Legend-Suche je Beschriftung, lineare Buchtyp-Suche) mit dem aktuellen
+(ein gemeinsamer Baum, schnellstes Backend, gezielte Suchen).
+
+Prüft zuerst, dass beide Abläufe dieselben Links und Metadaten liefern
+(sonst Exit-Code 1). Ausgenommen ist der Ort: die Ort-Suche liefert
+absichtlich den nächsten Tag statt des äußersten Wrappers, Abweichungen
+werden aufgelistet. Ebenso Buchtypen, die nur der neue Erkenner findet.
+
+Aufruf:
+    python benchmarks/bench_parse.py [gespeicherte_seite.html ...] [-n 20]
+
+Ohne Dateien wird eine synthetische Porta-fontium-Seite benutzt.
+"""
+import argparse
+import os
+import re
+import sys
+import time
+from urllib.parse import urljoin
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+from bs4 import BeautifulSoup  # noqa: E402
+
+# Namen, die der alte Code auf Modulebene erwartet
+DOC_TYPES = main.DOC_TYPES
+extract_dfg_images = main.extract_dfg_images
+
+SAMPLE_URL = "https://www.portafontium.eu/register/soa-plzen/cheb-01"
+
+
+def synthetic_page(pages=800):
+    links = "\n".join(
+        f'<li><a href="/iipsrv/iipsrv.fcgi?FIF=/data/cheb/{i:05d}.jp2">'
+        f'<img src="/thumbs/{i:05d}.jpg" alt="Seite {i}"></a></li>'
+        for i in range(1, pages + 1)
+    )
+    filler = "\n".join(
+        f'<div class="row"><span class="label">Feld {i}</span><span>Wert {i}</span></div>'
+        for i in range(300)
+    )
+    return f"""<!DOCTYPE html>
+<html lang="cs" xml:lang="cs"><head><title>Cheb 01 | Porta fontium</title>
+<meta property="og:title" content="Cheb 01"></head>
+<body><div id="page"><div id="main">
+<h1 id="page-title">Cheb 01</h1>
+{filler}
+<fieldset><legend>Materiál / forma</legend>
+<div class="field field-name-field-register-type"><div class="field-label">Typ:</div>
+<div class="field-items"><div class="field-item">Matrika zemřelých</div></div></div>
+<div class="field field-name-field-doc-dates"><div class="field-item">1780 - 1820</div></div>
+</fieldset>
+<table><tr><th>Místo:</th><td><strong>Cheb</strong></td></tr></table>
+<ul class="pages">{links}</ul>
+</div></div></body></html>"""
+
+
+# --- alter Stand, unverändert übernommen (nur umbenannt) ---
+
+def legacy_find_iip_links(html, base_url):
+    soup = BeautifulSoup(html, "html.parser")
+
+    # 1) GDA IIIF image detection (Porta Fontium Foto pages)
+    m = re.search(r'https://www\.gda\.bayern\.de/digitalisat/(?:iiif|jpeg)/[^"\s]+', html)
+    if m:
+        return [m.group(0)]
+
+    # 2) METS link detection (DFG viewer style)
+    mets = re.search(r'https://www\.gda\.bayern\.de/mets/[0-9a-f-]+', html)
+    if mets:
+        return extract_dfg_images(mets.group(0))
+
+    # 3) direct DFG viewer embed
+    if ("dfg-viewer.de" in base_url):
+        return extract_dfg_images(base_url)
+
+    # 4) classic Porta Fontium images
+    links = []
+    tags = soup.find_all(["a", "img"])
+    for tag in tags:
+        attr = tag.get("href") or tag.get("src")
+        if not attr:
+            continue
+        if any(x in attr for x in ["iipsrv", "fcgi-bin", ".jp2"]):
+            links.append(urljoin(base_url, attr))
+
+    return list(dict.fromkeys(links))
+
+
+def legacy_parse_pf_metadata(html: str, url: str) -> dict:
+    """
+    Spezieller Parser für Porta fontium.
+    Liest u.a.:
+      - Ort (Místo / Ort)
+      - Buchtyp (Material / Form -> Typ)
+      - Jahresbereich (Laufzeit / Datace)
+      - Übersetzte Buchtypen: type_de, type_cz, type_en
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    meta = {
+        "source": "Porta fontium",
+        "url": url,
+    }
+
+    # Sprache
+    html_tag = soup.find("html")
+    if html_tag:
+        lang = html_tag.get("xml:lang") or html_tag.get("lang")
+        if lang:
+            meta["lang"] = lang
+
+    # Titel finden
+    title = None
+
+    # 1) H1 bevorzugt
+    h1 = soup.find("h1", id="page-title") or soup.find("h1", class_="title")
+    if h1:
+        title = h1.get_text(strip=True)
+
+    # 2) Fallback: <meta property="og:title">
+    if not title:
+        og = soup.find("meta", property="og:title")
+        if og and og.get("content"):
+            title = og["content"].strip()
+
+    # 3) Fallback: echter <title> TAG, aber NIE zu lang
+    if not title:
+        if soup.title and soup.title.string:
+            t = soup.title.string.strip()
+            if len(t) < 200:  # verhindern von HTML-Schrott
+                title = t
+
+    # 4) Finaler Fallback
+    if not title:
+        title = "Unbenannt"
+
+    meta["title"] = title
+
+    # ---------- ORT ----------
+    place = None
+    place_field = soup.select_one(".field-name-field-doc-place .field-items")
+    if place_field:
+        strongs = [s.get_text(" ", strip=True)
+                   for s in place_field.select("strong")
+                   if s.get_text(strip=True)]
+        if strongs:
+            place = ", ".join(strongs)
+        else:
+            place = place_field.get_text(" ", strip=True)
+
+    if not place:
+        for label_text in ("Místo:", "Místo", "Ort:", "Ort"):
+            label = soup.find(
+                lambda tag: tag.name in ("div", "span", "th", "td")
+                            and label_text in tag.get_text()
+            )
+            if label and label.parent:
+                full = label.parent.get_text(" ", strip=True)
+                rest = full.replace(label_text, "").strip(" :\u00a0")
+                if rest:
+                    place = rest
+                    break
+
+    if place:
+        meta["place"] = place
+
+    # ---------- BUCHTYP ----------
+    type_items = []
+
+    type_block = soup.select_one(".field-name-field-register-type")
+    if type_block:
+        for itm in type_block.select(".field-item"):
+            t = itm.get_text(" ", strip=True)
+            if t:
+                type_items.append(t)
+
+    if not type_items:
+        for fld in soup.select(".field"):
+            label = fld.select_one(".field-label")
+            if not label:
+                continue
+            if "typ" in label.get_text(" ", strip=True).lower():
+                for itm in fld.select(".field-item"):
+                    t = itm.get_text(" ", strip=True)
+                    if t:
+                        type_items.append(t)
+                if type_items:
+                    break
+
+    if type_items:
+        seen = set()
+        unique = []
+        for t in type_items:
+            if t not in seen:
+                unique.append(t)
+                seen.add(t)
+        book_type = " | ".join(unique)
+        meta["book_type"] = book_type
+        # Haupttyp: erster Eintrag vor " | "
+        primary_type = unique[0]
+    else:
+        # URL-Logik für Karten, Fotos & mehr
+        u = url.lower()
+        if "/map/" in u:
+            primary_type = "map"
+        elif "/photo/" in u:
+            primary_type = "photo"
+        else:
+            primary_type = "Matrik"  # fallback
+        meta["book_type"] = primary_type
+
+    # Übersetzungen aus TYPE_TRANSLATIONS
+    def match_doc_type(primary_type):
+        text = primary_type.lower()
+
+        # 1. direktes Schlüsselwortmatching
+        for key, data in DOC_TYPES.items():
+            if key in text:
+                return data
+
+        # 2. Alias Matching
+        for key, data in DOC_TYPES.items():
+            if any(alias in text for alias in data["aliases"]):
+                return data
+
+        # 3. Sprach-Matching
+        for key, data in DOC_TYPES.items():
+            if data["cs"].lower() in text:
+                return data
+            if data["de"].lower() in text:
+                return data
+            if data["en"].lower() in text:
+                return data
+
+        # 4. Fallback
+        return {
+            "de": primary_type,
+            "cs": primary_type,
+            "en": primary_type
+        }
+
+    match = match_doc_type(primary_type)
+
+    meta["type_de"] = match["de"]
+    meta["type_cz"] = match["cs"]
+    meta["type_en"] = match["en"]
+
+    # ---------- DATEN (Laufzeit / Datace) ----------
+    date_text = None
+
+    date_field = soup.select_one(".field-name-field-doc-dates .field-item")
+    if date_field:
+        date_text = date_field.get_text(" ", strip=True)
+
+    if not date_text:
+        candidate = soup.find(
+            string=lambda s: s and "-" in s and any(ch.isdigit() for ch in s)
+        )
+        if candidate:
+            date_text = candidate.strip()
+
+    if date_text:
+        meta["date_raw"] = date_text
+        years = re.findall(r"(\d{3,4})", date_text)
+        if len(years) >= 2:
+            meta["year_from"], meta["year_to"] = years[0], years[1]
+        elif len(years) == 1:
+            meta["year_from"] = meta["year_to"] = years[0]
+
+    # ---------- Material-Block für Log ----------
+    material_section = None
+    for legend_label in ("Materiál / forma", "Material / Form", "Materiál / form",
+                         "Materiál / Forma", "Material / forma"):
+        leg = soup.find(
+            "legend",
+            string=lambda t: t and legend_label.lower() in t.lower()
+        )
+        if leg:
+            material_section = leg.find_parent("fieldset")
+            if material_section:
+                break
+
+    if material_section:
+        meta["material_section_text"] = material_section.get_text(
+            "\n", strip=True
+        )
+
+    return meta
+
+
+def legacy_resolve(html, url):
+    """Alter Ablauf: find_iip_links und parse_pf_metadata parsen je für sich."""
+    return legacy_find_iip_links(html, url), legacy_parse_pf_metadata(html, url)
+
+
+def current_resolve(html, url):
+    soup = main.parse_html(html)
+    links = main.find_iip_links(html, url, soup)
+    meta = main.parse_pf_metadata(html, url, soup)
+    return links, meta
+
+
+def timed(fn, html, url, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn(html, url)
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+# absichtlich geändert: Ort (nächster Tag statt äußerster Wrapper)
+EXPECTED_DIFFS = ("place",)
+TYPE_FIELDS = ("type_de", "type_cz", "type_en")
+
+
+def compare(old, new):
+    """
+    Vergleicht (links, meta) beider Abläufe.
+    Rückgabe: (Abweichungen, erwartete Abweichungen) als [(Feld, alt, neu)].
+    """
+    (old_links, old_meta), (new_links, new_meta) = old, new
+    diffs, expected = [], []
+    if old_links != new_links:
+        diffs.append(("links", len(old_links), len(new_links)))
+    # alter Rückfall: unerkannter Typ steht unübersetzt in allen drei Sprachen
+    old_unknown = len({old_meta.get(k) for k in TYPE_FIELDS}) == 1
+    for key in sorted(set(old_meta) | set(new_meta)):
+        a, b = old_meta.get(key), new_meta.get(key)
+        if a == b:
+            continue
+        if key in EXPECTED_DIFFS or (key in TYPE_FIELDS and old_unknown):
+            expected.append((key, a, b))
+        else:
+            diffs.append((key, a, b))
+    return diffs, expected
+
+
+def short(value, width=60):
+    text = repr(value)
+    return text if len(text) <= width else text[:width - 3] + "..."
+
+
+def main_cli():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("files", nargs="*", help="gespeicherte HTML-Seiten")
+    ap.add_argument("-n", "--repeat", type=int, default=10)
+    args = ap.parse_args()
+
+    samples = []
+    for path in args.files:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            samples.append((os.path.basename(path), f.read()))
+    if not samples:
+        samples.append(("synthetisch", synthetic_page()))
+
+    failed = False
+    print(f"Backend: {main.HTML_PARSER}")
+    print(f"{'Seite':30} {'vorher ms':>10} {'nachher ms':>11} {'Faktor':>7}  Links")
+    for name, html in samples:
+        diffs, expected = compare(legacy_resolve(html, SAMPLE_URL), current_resolve(html, SAMPLE_URL))
+        before = timed(legacy_resolve, html, SAMPLE_URL, args.repeat)
+        after = timed(current_resolve, html, SAMPLE_URL, args.repeat)
+        links, _ = current_resolve(html, SAMPLE_URL)
+        print(f"{name[:30]:30} {before * 1000:10.1f} {after * 1000:11.1f} "
+              f"{before / after:6.1f}x  {len(links)}")
+        for key, a, b in expected:
+            print(f"    erwartet anders  {key}: {short(a)} -> {short(b)}")
+        for key, a, b in diffs:
+            print(f"    ABWEICHUNG       {key}: {short(a)} -> {short(b)}")
+        failed |= bool(diffs)
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,166 @@
+"""
+Benchmark: Durchsatz des Downloaders gegen einen lokalen Ersatz-Server.
+
+Startet benchmarks/standin_server.py im selben Prozess (eigener Thread),
+lädt N Bücher mit dem echten Downloader und gibt ein JSON-Ergebnis aus:
+Seiten/s, MB/s, Latenz pro Seite (p50/p99/max), Spitzen-RSS, Zähler des
+Servers und die verwendete Konfiguration. Es wird nie das Live-Archiv
+angefragt.
+
+Aufruf:
+    python benchmarks/bench_throughput.py --books 4 --pages 100 -w 8 -c 16
+    python benchmarks/bench_throughput.py --latency-ms 80 --error-rate 0.05 --out result.json
+    python benchmarks/bench_throughput.py --source gda --books 50
+
+Ergebnisse verschiedener Läufe sind nur bei gleicher Konfiguration
+(und gleicher Maschine) vergleichbar.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main  # noqa: E402
+import standin_server  # noqa: E402
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux: KiB, macOS: Bytes
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, round(p / 100 * (len(values) - 1))))
+    return values[k]
+
+
+def book_urls(base, source, count):
+    if source == "gda":
+        return [f"{base}/gda/photo/foto-{i:04d}" for i in range(count)]
+    # "site=" sorgt dafür, dass is_porta_fontium() die Seite erkennt
+    return [f"{base}/register/buch-{i:04d}?site=portafontium.eu" for i in range(count)]
+
+
+def run(args):
+    server = standin_server.start_server(standin_server.config_from_args(args))
+    base = server.base_url
+    main.GDA_BASE = base
+
+    # Latenz pro Seite: download_image umhüllen
+    latencies = []
+    lock = threading.Lock()
+
+    def timed(func):
+        def wrapper(*a, **kw):
+            t0 = time.perf_counter()
+            try:
+                return func(*a, **kw)
+            finally:
+                with lock:
+                    latencies.append(time.perf_counter() - t0)
+        return wrapper
+
+    main.download_image = timed(main.download_image)
+
+    errors = []
+    with tempfile.TemporaryDirectory(prefix="pf-bench-") as tmp:
+        books = [{"url": u, "outdir": os.path.join(tmp, f"b{i}"), "pages": ""}
+                 for i, u in enumerate(book_urls(base, args.source, args.books))]
+
+        dl = main.Downloader(
+            books,
+            log_callback=lambda msg: errors.append(msg) if msg.startswith("[!]") else None,
+            page_workers=args.workers,
+            max_connections=args.connections,
+            prefetch_books=args.prefetch,
+            # die Testbilder sind keine dekodierbaren JPEGs -> nicht zusammensetzen
+            tiled=main.TILED_NEVER,
+            profile=args.profile,
+        )
+        t0 = time.perf_counter()
+        dl.run()
+        elapsed = time.perf_counter() - t0
+        metrics = dl.metrics_snapshot()
+
+        pages = 0
+        size = 0
+        for root, _, files in os.walk(tmp):
+            for f in files:
+                if f.lower().endswith(".jpg"):
+                    pages += 1
+                    size += os.path.getsize(os.path.join(root, f))
+
+    server.shutdown()
+    server.server_close()
+
+    return {
+        "config": {
+            "source": args.source,
+            "books": args.books,
+            "pages_per_book": args.pages if args.source == "pf" else 1,
+            "page_kb": args.page_kb,
+            "workers": args.workers,
+            "connections": args.connections,
+            "prefetch": args.prefetch,
+            "profile": args.profile,
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "bandwidth_kbps": args.bandwidth_kbps,
+            "error_rate": args.error_rate,
+            "python": sys.version.split()[0],
+            "html_parser": main.HTML_PARSER,
+        },
+        "elapsed_s": round(elapsed, 3),
+        "pages": pages,
+        "bytes": size,
+        "pages_per_s": round(pages / elapsed, 2) if elapsed else None,
+        "mb_per_s": round(size / (1024 * 1024) / elapsed, 2) if elapsed else None,
+        "page_latency_s": {
+            "p50": round(percentile(latencies, 50), 4) if latencies else None,
+            "p99": round(percentile(latencies, 99), 4) if latencies else None,
+            "max": round(max(latencies), 4) if latencies else None,
+        },
+        "peak_rss_mb": peak_rss_mb(),
+        "errors_logged": len(errors),
+        "server": dict(server.stats),
+        "metrics": {k: v for k, v in metrics.items() if k in ("counters", "histograms")},
+    }
+
+
+def main_cli():
+    ap = argparse.ArgumentParser(description="Durchsatz-Benchmark gegen einen lokalen Ersatz-Server")
+    ap.add_argument("--source", choices=("pf", "gda"), default="pf",
+                    help="pf = IIP-Bücher, gda = GDA-Fotoseiten mit IIIF-Bild")
+    ap.add_argument("--books", type=int, default=4)
+    ap.add_argument("-w", "--workers", type=int, default=main.DEFAULT_PAGE_WORKERS)
+    ap.add_argument("-c", "--connections", type=int, default=main.DEFAULT_MAX_CONNECTIONS)
+    ap.add_argument("--prefetch", type=int, default=main.DEFAULT_PREFETCH_BOOKS)
+    ap.add_argument("--profile", choices=list(main.QUALITY_PROFILES), default=main.DEFAULT_PROFILE)
+    standin_server.add_config_arguments(ap)
+    ap.add_argument("--out", help="Ergebnis zusätzlich als JSON-Datei speichern")
+    args = ap.parse_args()
+
+    result = run(args)
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    print(text)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main_cli()
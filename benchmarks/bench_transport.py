@@ -0,0 +1,159 @@
+"""
+Benchmark: Transportschicht für große Scans (CPU pro MB und MB/s).
+
+Startet benchmarks/standin_server.py in einem eigenen Prozess (damit die
+Server-CPU nicht mitgemessen wird) und lädt dieselben Seiten mehrmals:
+
+  - legacy:  iter_content(8192) in eine gepufferte Datei (alter Stand)
+  - tuned:   main.download_to_part mit readinto in wiederverwendete Puffer
+             und verschiedenen Blockgrößen
+
+Gemessen werden Wandzeit, CPU-Zeit (process_time) und daraus MB/s und
+CPU-Millisekunden pro MB; Ausgabe als JSON.
+
+Aufruf:
+    python benchmarks/bench_transport.py --page-kb 8000 --count 20
+    python benchmarks/bench_transport.py --chunks 65536,262144,1048576 --out transport.json
+"""
+import argparse
+import hashlib
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import main  # noqa: E402
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(page_kb):
+    port = free_port()
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(HERE, "standin_server.py"), "--port", str(port),
+         "--page-kb", str(page_kb), "--latency-ms", "0", "--jitter-ms", "0"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return proc, f"http://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError("Ersatzserver startet nicht")
+
+
+def legacy_download(url, path, session):
+    """Bisherige Schleife: 8-KiB-Blöcke aus iter_content, Hash, Schreiben."""
+    hasher = hashlib.sha256()
+    with session.get(url, stream=True, timeout=60) as r:
+        r.raise_for_status()
+        with open(path, "wb") as f:
+            for chunk in r.iter_content(chunk_size=8192):
+                f.write(chunk)
+                hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def tuned_download(url, path, session):
+    return main.download_to_part(url, path, session)
+
+
+def measure(name, func, urls, tmp, session, repeat):
+    best = None
+    digests = []
+    for _ in range(repeat):
+        paths = [os.path.join(tmp, f"{name}-{i}.jpg") for i in range(len(urls))]
+        for p in paths:
+            if os.path.exists(p):
+                os.remove(p)
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        digests = [func(u, p, session) for u, p in zip(urls, paths)]
+        wall, cpu = time.perf_counter() - wall0, time.process_time() - cpu0
+        size = sum(os.path.getsize(p) for p in paths)
+        if best is None or wall < best[0]:
+            best = (wall, cpu, size)
+    wall, cpu, size = best
+    mb = size / (1024 * 1024)
+    return {
+        "name": name,
+        "mb": round(mb, 1),
+        "wall_s": round(wall, 3),
+        "cpu_s": round(cpu, 3),
+        "mb_per_s": round(mb / wall, 1) if wall else None,
+        "cpu_ms_per_mb": round(cpu * 1000 / mb, 2) if mb else None,
+    }, digests
+
+
+def run(args):
+    proc, base = start_server(args.page_kb)
+    urls = [f"{base}/fcgi-bin/iipsrv.fcgi?FIF=/bench/{i}.jp2&CVT=jpeg" for i in range(args.count)]
+    chunks = [int(c) for c in args.chunks.split(",") if c.strip()]
+    results = []
+    mismatch = False
+    try:
+        with tempfile.TemporaryDirectory(prefix="pf-transport-") as tmp:
+            session = main.create_session(4)
+            # Aufwärmen (Verbindung, Seitencache des Servers)
+            legacy_download(urls[0], os.path.join(tmp, "warmup.jpg"), session)
+
+            row, reference = measure("legacy-8k", legacy_download, urls, tmp, session, args.repeat)
+            results.append(dict(row, chunk=8192))
+
+            saved = main.DOWNLOAD_CHUNK
+            try:
+                for chunk in chunks:
+                    main.DOWNLOAD_CHUNK = chunk
+                    row, digests = measure(f"tuned-{chunk // 1024}k", tuned_download, urls, tmp,
+                                           session, args.repeat)
+                    mismatch |= digests != reference
+                    results.append(dict(row, chunk=chunk))
+            finally:
+                main.DOWNLOAD_CHUNK = saved
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    return {
+        "config": {
+            "page_kb": args.page_kb,
+            "count": args.count,
+            "repeat": args.repeat,
+            "python": sys.version.split()[0],
+        },
+        "identical_files": not mismatch,
+        "results": results,
+    }
+
+
+def main_cli():
+    ap = argparse.ArgumentParser(description="Transport-Benchmark (CPU/MB, MB/s) gegen einen lokalen Ersatz-Server")
+    ap.add_argument("--page-kb", type=int, default=8000, help="Größe eines Scans in KiB")
+    ap.add_argument("--count", type=int, default=10, help="Scans je Durchgang")
+    ap.add_argument("--repeat", type=int, default=3, help="Durchgänge je Variante (bester zählt)")
+    ap.add_argument("--chunks", default="65536,262144,1048576",
+                    help="Blockgrößen für die neue Variante (Bytes, kommagetrennt)")
+    ap.add_argument("--out", help="Ergebnis zusätzlich als JSON-Datei speichern")
+    args = ap.parse_args()
+
+    result = run(args)
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    print(text)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,335 @@
+"""
+Lokaler Ersatz-Server für Benchmarks (kein Zugriff auf das Live-Archiv).
+
+Emuliert:
+  - Porta-fontium-Buchseiten   /register/<buch>?site=portafontium.eu
+  - IIP-Bildserver             /fcgi-bin/iipsrv.fcgi?FIF=...&cvt=jpeg (WID, obj=..., JTL=..., Range)
+  - GDA-Fotoseiten             /gda/photo/<buch>   (enthält einen IIIF-Link)
+  - GDA-METS-Seiten            /gda/mets/<buch>    (enthält einen METS-Link)
+  - METS / IIIF                /mets/<uuid>, /digitalisat/iiif/<uuid>/<n>[/info.json | /<region>/...]
+  - IIIF-Viewer / Manifeste    /viewer/<buch>[?v=2]  (Viewer-Link mit ?manifest=...),
+                               /iiif/presentation/<2|3>/<buch>/manifest
+
+Latenz, Bandbreite und Fehler (503/429 mit Retry-After, Verbindungsabbruch,
+abgeschnittene Antworten) sind konfigurierbar.
+
+Eigenständig:
+    python benchmarks/standin_server.py --port 8080 --pages 200 --latency-ms 50
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, quote
+
+DEFAULTS = {
+    "pages": 100,           # Seiten je Buch
+    "page_kb": 400,         # Größe einer Seite bei voller Auflösung
+    "latency_ms": 20.0,     # Wartezeit vor dem ersten Byte
+    "jitter_ms": 5.0,
+    "bandwidth_kbps": 0,    # je Verbindung, 0 = unbegrenzt
+    "error_rate": 0.0,      # Anteil fehlerhafter Bildantworten
+    "retry_after": 1,       # Sekunden für 503/429
+    "width": 4000,          # Bildgröße für obj=Max-size / info.json
+    "height": 3000,
+    "tile": 512,
+}
+
+
+def book_uuid(book):
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"standin/{book}"))
+
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, config):
+        super().__init__(address, StandinHandler)
+        self.config = dict(DEFAULTS, **config)
+        self.block = random.Random(0).randbytes(self.config["page_kb"] * 1024)
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "image_requests": 0, "bytes_sent": 0, "errors_injected": 0}
+
+    @property
+    def base_url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def count(self, key, n=1):
+        with self.lock:
+            self.stats[key] += n
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    # --- Hilfen ---
+
+    def delay(self):
+        cfg = self.server.config
+        ms = cfg["latency_ms"] + random.uniform(-cfg["jitter_ms"], cfg["jitter_ms"])
+        if ms > 0:
+            time.sleep(ms / 1000)
+
+    def send_body(self, body, ctype, status=200, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.write_throttled(body)
+
+    def write_throttled(self, body):
+        kbps = self.server.config["bandwidth_kbps"]
+        if not kbps:
+            self.wfile.write(body)
+        else:
+            chunk = max(1024, kbps * 1024 // 20)
+            for i in range(0, len(body), chunk):
+                self.wfile.write(body[i:i + chunk])
+                time.sleep(len(body[i:i + chunk]) / (kbps * 1024))
+        self.server.count("bytes_sent", len(body))
+
+    def inject_error(self, body=None):
+        """
+        Fehler je nach error_rate. True = Antwort wurde bereits gesendet.
+        body: echte Antwort, deren erste Hälfte beim Abbruch gesendet wird
+        (damit ein Range-Fortsetzen die richtigen Bytes ergibt).
+        """
+        cfg = self.server.config
+        if random.random() >= cfg["error_rate"]:
+            return False
+        self.server.count("errors_injected")
+        kind = random.choice(("503", "429", "reset", "truncate"))
+        if kind in ("503", "429"):
+            self.send_body(b"", "text/plain", int(kind), {"Retry-After": str(cfg["retry_after"])})
+        elif kind == "reset":
+            self.close_connection = True
+            self.connection.close()
+        else:
+            if body is None:
+                body = self.image_bytes("truncated", 1.0)
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body[:len(body) // 2])
+            self.close_connection = True
+        return True
+
+    def image_bytes(self, key, scale):
+        """Gültiger JPEG-Rahmen (SOI ... EOI), Größe proportional zu scale."""
+        block = self.server.block
+        size = max(64, int(len(block) * scale))
+        head = hashlib.sha256(key.encode("utf-8")).digest()
+        return b"\xff\xd8" + head + block[:size] + b"\xff\xd9"
+
+    def send_image(self, key, scale=1.0):
+        self.server.count("image_requests")
+        body = self.image_bytes(key, scale)
+        if self.inject_error(body):
+            return
+        rng = self.headers.get("Range", "")
+        if rng.startswith("bytes=") and rng[6:].rstrip("-").isdigit():
+            start = int(rng[6:].rstrip("-"))
+            if start >= len(body):
+                return self.send_body(b"", "image/jpeg", 416)
+            return self.send_body(body[start:], "image/jpeg", 206,
+                                  {"Content-Range": f"bytes {start}-{len(body) - 1}/{len(body)}"})
+        self.send_body(body, "image/jpeg")
+
+    # --- Routen ---
+
+    def do_GET(self):
+        self.server.count("requests")
+        self.delay()
+        u = urlparse(self.path)
+        qs = parse_qs(u.query)
+        parts = [p for p in u.path.split("/") if p]
+        try:
+            if parts[:1] == ["register"] and len(parts) == 2:
+                return self.book_page(parts[1])
+            if parts[:2] == ["gda", "photo"] and len(parts) == 3:
+                return self.gda_photo_page(parts[2])
+            if parts[:2] == ["gda", "mets"] and len(parts) == 3:
+                return self.gda_mets_page(parts[2])
+            if parts[:1] == ["viewer"] and len(parts) == 2:
+                return self.viewer_page(parts[1], qs.get("v", ["3"])[0])
+            if parts[:2] == ["iiif", "presentation"] and len(parts) == 5 and parts[4] == "manifest":
+                return self.manifest(parts[3], parts[2])
+            if parts[:1] == ["mets"] and len(parts) == 2:
+                return self.mets(parts[1])
+            if parts[:2] == ["digitalisat", "iiif"] and len(parts) >= 4:
+                return self.iiif(parts[2:], u.path)
+            if u.path.endswith("iipsrv.fcgi"):
+                return self.iip(qs)
+        except (BrokenPipeError, ConnectionResetError):
+            return
+        self.send_body(b"not found", "text/plain", 404)
+
+    def book_page(self, book):
+        cfg = self.server.config
+        links = "\n".join(
+            f'<li><a href="/fcgi-bin/iipsrv.fcgi?FIF=/books/{book}/{i:05d}.jp2">'
+            f'<img src="/thumbs/{book}/{i:05d}.jpg"></a></li>'
+            for i in range(1, cfg["pages"] + 1))
+        html = f"""<!DOCTYPE html><html lang="cs"><head><title>{book} | Porta fontium</title></head>
+<body><h1 id="page-title">{book}</h1>
+<div class="field field-name-field-doc-place"><div class="field-items"><strong>Cheb</strong></div></div>
+<fieldset><legend>Materiál / forma</legend>
+<div class="field field-name-field-register-type"><div class="field-label">Typ:</div>
+<div class="field-items"><div class="field-item">Matrika zemřelých</div></div></div>
+<div class="field field-name-field-doc-dates"><div class="field-item">1780 - 1820</div></div>
+</fieldset><ul>{links}</ul></body></html>"""
+        self.send_body(html.encode("utf-8"), "text/html; charset=utf-8")
+
+    def gda_photo_page(self, book):
+        link = f"{self.server.base_url}/digitalisat/iiif/{book_uuid(book)}/1"
+        html = f'<html><head><title>Foto {book}</title></head><body><img src="{link}/full/full/0/default.jpg"></body></html>'
+        self.send_body(html.encode("utf-8"), "text/html; charset=utf-8")
+
+    def gda_mets_page(self, book):
+        link = f"{self.server.base_url}/mets/{book_uuid(book)}"
+        html = f'<html><head><title>METS {book}</title></head><body><a href="{link}">METS</a></body></html>'
+        self.send_body(html.encode("utf-8"), "text/html; charset=utf-8")
+
+    def viewer_page(self, book, version):
+        manifest = quote(f"{self.server.base_url}/iiif/presentation/{version}/{book}/manifest", safe="")
+        html = (f'<html><head><title>Viewer {book}</title></head><body>'
+                f'<iframe src="/mirador/index.html?manifest={manifest}"></iframe>'
+                f'<p>IIIF-Viewer</p></body></html>')
+        self.send_body(html.encode("utf-8"), "text/html; charset=utf-8")
+
+    def manifest(self, book, version):
+        """IIIF-Presentation-Manifest (v2 oder v3), je Seite ein Canvas mit Image-Service."""
+        cfg = self.server.config
+        base = self.server.base_url
+        uid = book_uuid(book)
+        url = f"{base}/iiif/presentation/{version}/{book}/manifest"
+        w, h = cfg["width"], cfg["height"]
+        canvases = []
+        for i in range(1, cfg["pages"] + 1):
+            service = f"{base}/digitalisat/iiif/{uid}/{i}"
+            if version == "2":
+                canvases.append({
+                    "@id": f"{url}/canvas/{i}", "@type": "sc:Canvas", "label": str(i),
+                    "width": w, "height": h,
+                    "images": [{"@type": "oa:Annotation", "motivation": "sc:painting", "on": f"{url}/canvas/{i}",
+                                "resource": {"@id": f"{service}/full/full/0/default.jpg", "@type": "dctypes:Image",
+                                             "format": "image/jpeg", "width": w, "height": h,
+                                             "service": {"@context": "http://iiif.io/api/image/2/context.json",
+                                                         "@id": service,
+                                                         "profile": "http://iiif.io/api/image/2/level1.json"}}}]})
+            else:
+                canvases.append({
+                    "id": f"{url}/canvas/{i}", "type": "Canvas", "label": {"none": [str(i)]},
+                    "width": w, "height": h,
+                    "items": [{"id": f"{url}/page/{i}", "type": "AnnotationPage",
+                               "items": [{"id": f"{url}/annotation/{i}", "type": "Annotation",
+                                          "motivation": "painting", "target": f"{url}/canvas/{i}",
+                                          "body": {"id": f"{service}/full/max/0/default.jpg", "type": "Image",
+                                                   "format": "image/jpeg", "width": w, "height": h,
+                                                   "service": [{"id": service, "type": "ImageService3",
+                                                                "profile": "level1"}]}}]}]})
+        if version == "2":
+            doc = {"@context": "http://iiif.io/api/presentation/2/context.json", "@id": url,
+                   "@type": "sc:Manifest", "label": f"Buch {book}",
+                   "sequences": [{"@type": "sc:Sequence", "canvases": canvases}]}
+        else:
+            doc = {"@context": "http://iiif.io/api/presentation/3/context.json", "id": url,
+                   "type": "Manifest", "label": {"de": [f"Buch {book}"]}, "items": canvases}
+        self.send_body(json.dumps(doc).encode("utf-8"), "application/ld+json")
+
+    def mets(self, uid):
+        base = self.server.base_url
+        files = "\n".join(
+            f'<mets:file ID="DEFAULT_{i}" MIMETYPE="image/jpeg"><mets:FLocat LOCTYPE="URL" '
+            f'xlink:href="{base}/digitalisat/iiif/{uid}/{i}/full/full/0/default.jpg"/></mets:file>'
+            for i in range(1, self.server.config["pages"] + 1))
+        pages = "\n".join(
+            f'<mets:div TYPE="page" ID="PHYS_{i}" ORDER="{i}"><mets:fptr FILEID="DEFAULT_{i}"/></mets:div>'
+            for i in range(1, self.server.config["pages"] + 1))
+        xml = f"""<?xml version="1.0" encoding="UTF-8"?>
+<mets:mets xmlns:mets="http://www.loc.gov/METS/" xmlns:xlink="http://www.w3.org/1999/xlink">
+<mets:fileSec><mets:fileGrp USE="DEFAULT">{files}</mets:fileGrp></mets:fileSec>
+<mets:structMap TYPE="PHYSICAL"><mets:div TYPE="physSequence">{pages}</mets:div></mets:structMap>
+</mets:mets>"""
+        self.send_body(xml.encode("utf-8"), "application/xml")
+
+    def iiif(self, parts, path):
+        cfg = self.server.config
+        uid, n, rest = parts[0], parts[1], parts[2:]
+        if rest == ["info.json"]:
+            info = {"@context": "http://iiif.io/api/image/2/context.json",
+                    "@id": f"{self.server.base_url}/digitalisat/iiif/{uid}/{n}",
+                    "width": cfg["width"], "height": cfg["height"],
+                    "tiles": [{"width": cfg["tile"], "scaleFactors": [1]}]}
+            return self.send_body(json.dumps(info).encode("utf-8"), "application/json")
+        scale = 1.0
+        if len(rest) == 4:
+            region, size = rest[0], rest[1]
+            if region != "full":
+                x, y, w, h = map(int, region.split(","))
+                scale = (w * h) / (cfg["width"] * cfg["height"])
+            elif size.rstrip(",").isdigit():
+                scale = (int(size.rstrip(",")) / cfg["width"]) ** 2
+        self.send_image(path, min(1.0, scale))
+
+    def iip(self, qs):
+        cfg = self.server.config
+        fif = qs.get("FIF", [""])[0]
+        if "obj" in qs:
+            levels = 1
+            while max(cfg["width"], cfg["height"]) >> levels >= cfg["tile"]:
+                levels += 1
+            text = (f"IIP:1.0\nMax-size:{cfg['width']} {cfg['height']}\n"
+                    f"Tile-size:{cfg['tile']} {cfg['tile']}\nResolution-number:{levels}\n")
+            return self.send_body(text.encode("ascii"), "text/plain")
+        if "JTL" in qs:
+            tiles = -(-cfg["width"] // cfg["tile"]) * -(-cfg["height"] // cfg["tile"])
+            return self.send_image(fif + qs["JTL"][0], 1.0 / tiles)
+        scale = 1.0
+        if "WID" in qs:
+            scale = min(1.0, (int(qs["WID"][0]) / cfg["width"]) ** 2)
+        self.send_image(fif + qs.get("WID", [""])[0] + qs.get("Q", [""])[0], scale)
+
+
+def start_server(config=None, host="127.0.0.1", port=0):
+    """Startet den Server in einem Hintergrund-Thread und gibt ihn zurück."""
+    server = StandinServer((host, port), config or {})
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def add_config_arguments(ap):
+    ap.add_argument("--pages", type=int, default=DEFAULTS["pages"], help="Seiten je Buch")
+    ap.add_argument("--page-kb", type=int, default=DEFAULTS["page_kb"], help="Seitengröße in KiB")
+    ap.add_argument("--latency-ms", type=float, default=DEFAULTS["latency_ms"])
+    ap.add_argument("--jitter-ms", type=float, default=DEFAULTS["jitter_ms"])
+    ap.add_argument("--bandwidth-kbps", type=int, default=DEFAULTS["bandwidth_kbps"],
+                    help="KiB/s je Verbindung (0 = unbegrenzt)")
+    ap.add_argument("--error-rate", type=float, default=DEFAULTS["error_rate"],
+                    help="Anteil fehlerhafter Bildantworten (0..1)")
+    ap.add_argument("--retry-after", type=int, default=DEFAULTS["retry_after"])
+
+
+def config_from_args(args):
+    return {k: getattr(args, k) for k in DEFAULTS if hasattr(args, k)}
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Lokaler Porta-fontium-/IIP-/GDA-Ersatzserver")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8080)
+    add_config_arguments(ap)
+    args = ap.parse_args()
+    srv = StandinServer((args.host, args.port), config_from_args(args))
+    print(f"Ersatzserver läuft auf {srv.base_url}")
+    srv.serve_forever()
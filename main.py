@@ -1,28 +1,192 @@
 import os
 import re
+import sys
+import csv
 import json
+import time
+import random
+import itertools
+import bisect
+import hashlib
+import queue
+import shutil
+import socket
+import sqlite3
+import multiprocessing
 import threading
-import tkinter as tk
-from tkinter import ttk, filedialog, messagebox, simpledialog
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse, parse_qs
-import webbrowser
+import importlib.util
+import unicodedata
+from collections import deque, OrderedDict
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urljoin, urlparse, parse_qs, unquote
 from datetime import datetime
+from email.utils import parsedate_to_datetime
 import xml.etree.ElementTree as ET
 
-# Versuche ReportLab für PDF-Export zu laden
-try:
-    from reportlab.lib.pagesizes import A4
-    from reportlab.pdfgen import canvas
+# Schwere Abhängigkeiten (tkinter, requests, bs4, reportlab) werden erst
+# bei Bedarf importiert, damit der Kommandozeilenmodus ohne GUI startet.
+
+# ReportLab für PDF-Export vorhanden?
+HAVE_REPORTLAB = importlib.util.find_spec("reportlab") is not None
+# Pillow (PDF-Export, Zusammensetzen von Kacheln) vorhanden?
+HAVE_PIL = importlib.util.find_spec("PIL") is not None
 
-    HAVE_REPORTLAB = True
-except ImportError:
-    HAVE_REPORTLAB = False
+# lxml ist als BeautifulSoup-Backend deutlich schneller als html.parser (optional)
+HTML_PARSER = "lxml" if importlib.util.find_spec("lxml") else "html.parser"
+
+# ijson liest große IIIF-Manifeste gestreamt statt komplett per json (optional)
+HAVE_IJSON = importlib.util.find_spec("ijson") is not None
+IIIF_STREAM_MIN_BYTES = 4 * 1024 * 1024   # kleinere Manifeste: json ist schneller
 
 DEFAULT_HEADERS = {"User-Agent": "portafontium-downloader/GUI"}
+
+# Basis-URL des Bayerischen Hauptstaatsarchivs (IIIF / METS), für Tests änderbar
+GDA_BASE = "https://www.gda.bayern.de"
+
+# METS (GDA, DFG-Viewer): Dateigruppen mit Seitenbildern, beste zuerst
+METS_FILE_GROUPS = ("MAX", "DEFAULT", "ORIGINAL", "PRESENTATION", "DOWNLOAD")
+METS_NS = "{http://www.loc.gov/METS/}"
+XLINK_HREF = "{http://www.w3.org/1999/xlink}href"
+
+# Parallele Seitendownloads: pro Buch / insgesamt (gemeinsamer Session-Pool)
+DEFAULT_PAGE_WORKERS = 8
+DEFAULT_MAX_CONNECTIONS = 16
+# Anzahl Bücher, deren HTML/Metadaten im Voraus aufgelöst werden
+DEFAULT_PREFETCH_BOOKS = 2
+
+# Transport: große Lesepuffer (readinto in wiederverwendeten Puffer je Thread), TCP-Keepalive.
+# Keine Vorab-Belegung der .part-Datei: nach einem Absturz ist ihre Größe der Range-Offset.
+DOWNLOAD_CHUNK = 128 * 1024     # Messung: benchmarks/bench_transport.py
+HTTP_POOL_HOSTS = 8          # Anzahl Hosts mit eigenem Verbindungspool
+HTTP_KEEPALIVE = True
+
+# Wiederholungen mit exponentiellem Backoff (mit Jitter), Retry-After wird beachtet
+DOWNLOAD_RETRIES = 5
+RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+RETRY_AFTER_MAX = 300.0
+
+# Bandbreiten-Profile: Breite (IIP WID / IIIF size), JPEG-Qualität, IIIF-Qualität.
+# Mit kleineren Profilen geladene Seiten werden in page_quality.json vermerkt
+# und bei einem späteren Lauf mit besserem Profil ersetzt (Vorschau zuerst).
+QUALITY_PROFILES = {
+    "full": {"wid": None, "q": 90, "iiif_quality": "default"},
+    "high": {"wid": 3000, "q": 85, "iiif_quality": "default"},
+    "medium": {"wid": 2000, "q": 80, "iiif_quality": "default"},
+    "preview": {"wid": 1000, "q": 60, "iiif_quality": "default"},
+}
+DEFAULT_PROFILE = "full"
+PAGE_QUALITY_FILE = "page_quality.json"
+
+# Prüfsummen je Buch (sha256sum-Format) neben metadata.txt
+CHECKSUM_FILE = "checksums.sha256"
+HASH_CHUNK = 1024 * 1024
+
+# Seitenliste eines exportierten PDFs (Name, Größe, Inode, mtime je Bild);
+# mtime allein reicht nicht, Hardlinks/Reflinks aus dem PageStore sind älter
+PDF_PAGES_SUFFIX = ".pages.json"
+
+# Kachel-Download für sehr große Bilder (Karten): IIP-JTL oder IIIF-Regionen
+TILED_AUTO, TILED_ALWAYS, TILED_NEVER = "auto", "always", "never"
+TILED_MIN_PIXELS = 25_000_000          # ab hier lohnt sich das Zerlegen
+TILED_MAX_PIXELS = 500_000_000         # Obergrenze für das Zusammensetzen im RAM
+TILED_JPEG_QUALITY = 90
+# Zusammensetzen braucht das ganze Bild im RAM (3 Byte/Pixel, bis ~1,5 GB
+# bei TILED_MAX_PIXELS) – höchstens so viele Seiten gleichzeitig, die
+# übrigen Seiten-Threads warten (Kacheln laden läuft weiter parallel)
+TILED_MAX_STITCHES = 2
+TILED_STITCH_SLOTS = threading.BoundedSemaphore(TILED_MAX_STITCHES)
+TILE_DIR_SUFFIX = ".tiles"
+
+# Adaptive Parallelität je Host (AIMD): Start, Halbierung bei Fehlern,
+# Wachstum solange die Latenz unter LATENCY_TOLERANCE x Bestwert bleibt
+AIMD_INITIAL_LIMIT = 4
+AIMD_DECREASE = 0.5
+LATENCY_TOLERANCE = 2.0
+
+# Laufzeit-Metriken (Zähler / Histogramme), Export als JSON oder Prometheus-Textfile
+METRICS_PREFIX = "portafontium_"
+METRICS_WRITE_INTERVAL = 5.0
+METRICS_TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+METRICS_RATE_BUCKETS = tuple(2 ** n * 1024 for n in range(6, 18, 2))   # 64 KiB/s .. 64 MiB/s
+METRIC_HELP = {
+    "books_total": "Bearbeitete Bücher",
+    "pages_downloaded_total": "Heruntergeladene Seiten",
+    "pages_failed_total": "Fehlgeschlagene Seiten",
+    "pages_skipped_total": "Bereits vorhandene Seiten",
+    "pages_from_store_total": "Aus dem Seitenspeicher übernommene Seiten",
+    "manifest_cache_hits_total": "Buchseiten direkt aus dem Manifest-Cache",
+    "retries_total": "Wiederholte Anfragen",
+    "bytes_written_total": "Geschriebene Bytes (Bilder und Kacheln)",
+    "disk_write_seconds_total": "Zeit für Schreibzugriffe in Sekunden",
+    "html_fetch_seconds": "Ladezeit der Buchseiten in Sekunden",
+    "parse_seconds": "Parse-Zeit je Buchseite in Sekunden",
+    "ttfb_seconds": "Zeit bis zum ersten Byte je Bildanfrage in Sekunden",
+    "transfer_bytes_per_second": "Übertragungsrate je Bildanfrage in Bytes/s",
+}
+METRIC_BUCKETS = {
+    "html_fetch_seconds": METRICS_TIME_BUCKETS,
+    "parse_seconds": METRICS_TIME_BUCKETS,
+    "ttfb_seconds": METRICS_TIME_BUCKETS,
+    "transfer_bytes_per_second": METRICS_RATE_BUCKETS,
+}
+
+# Lokaler Cache für aufgelöste Bildlinks + Metadaten je Buch-URL
+MANIFEST_CACHE_TTL = 7 * 24 * 3600
+MANIFEST_CACHE_MAX_BYTES = 50 * 1024 * 1024
+# erhöhen, wenn sich die Auflösung der Links ändert (alte Einträge verwerfen)
+MANIFEST_CACHE_FORMAT = 2
+
+# Lokaler Katalog (SQLite + FTS5) aller heruntergeladenen Bücher, siehe Catalog
+CATALOG_FILE = "catalog.sqlite"
+CATALOG_DB_VERSION = 1
+CATALOG_SCAN_WORKERS = 8
+METADATA_FILE_NAME = "metadata.txt"
+
+# Persistente Warteliste (SQLite): Bücher, aufgelöste Seiten, Zustand je Seite
+JOB_DB_FILE = "jobs.sqlite"
+JOB_DB_VERSION = 1
+# Worker-Modus: Bücher werden mit Lease vergeben und per Heartbeat verlängert;
+# abgelaufene Leases (abgestürzter Worker) werden neu vergeben
+WORKER_LEASE = 120.0
+WORKER_POLL = 2.0
+BOOK_PENDING, BOOK_RUNNING, BOOK_DONE, BOOK_PARTIAL, BOOK_FAILED, BOOK_CANCELLED = (
+    "pending", "running", "done", "partial", "failed", "cancelled")
+PAGE_PENDING, PAGE_DONE, PAGE_FAILED = "pending", "done", "failed"
+# Anzeige in der Warteliste (Treeview / Kommandozeile)
+BOOK_STATUS_ICONS = {
+    BOOK_PENDING: "⏳", BOOK_RUNNING: "⏳", BOOK_DONE: "✅",
+    BOOK_PARTIAL: "⚠️", BOOK_FAILED: "❌", BOOK_CANCELLED: "❌",
+}
+
+# Massenimport: URL-Listen (Text/CSV) und Porta-fontium-Such-/Bestandsseiten
+IMPORT_BATCH = 500
+IMPORT_MAX_PAGES = 10000
+PF_ITEM_PATH_RE = re.compile(
+    r"^/(?:[a-z]{2}/)?(?:register|chronicle|map|photo|document|periodical|book|census|"
+    r"official-book)/[^/]+/[^/?#]+/?$")
+URL_RE = re.compile(r"https?://[^\s\"'<>]+")
+
+# Logdateien: gepuffert im Hintergrund, Rotation nach Größe
+LOG_FILE_NAME = "download_log.txt"
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUPS = 3
+LOG_FLUSH_INTERVAL = 2.0
+LOG_MAX_OPEN_FILES = 32
+
 FONT_DEFAULT = ("Calibri", 12)
 
+# GUI-Aktualisierung: Ereignisse aus dem Download-Thread werden gesammelt
+# und im Tk-Mainloop alle UI_POLL_MS Millisekunden gebündelt angezeigt
+UI_POLL_MS = 100
+UI_MAX_EVENTS_PER_TICK = 10000
+STATS_POLL_MS = 1000
+# Warteliste: Treeview zeigt nur eine Seite, Status aller Bücher liegt im Speicher
+VIEW_PAGE_SIZE = 500
+LOG_MAX_LINES = 5000
+
 DARK_BG = "#1e1e1e"
 DARK_FG = "#e6e6e6"
 DARK_ACCENT = "#3c3f41"
@@ -40,12 +204,14 @@ LANG = {
         "save_list": "💾 Warteliste speichern",
         "load_list": "📂 Warteliste laden",
         "export_pdf": "📄 Zu PDF exportieren",
+        "bulk_import": "📥 Massenimport",
         "choose_dir": "📂 Zielordner auswählen",
         "book_url": "Buch-URL:",
         "target_dir": "Zielordner:",
         "pages": "Seiten:",
         "pages_hint": "(z.B. 1,5,8-10; leer = alle)",
         "waiting_list": "Warteliste:",
+        "view_page": "Seite {page}/{pages} · {count} Bücher",
         "col_book": "Buch / Karte / Sonstiges",
         "col_pages": "Seite/n",
         "col_status": "Status",
@@ -56,9 +222,27 @@ LANG = {
         "error_no_url": "Bitte eine Buch-URL eingeben.",
         "error_no_selection": "Bitte mindestens ein Buch aus der Warteliste auswählen.",
         "save_log": "📄 Log speichern",
+        "book_log": "📁 Log je Buch",
+        "quality": "Qualität:",
         "pdf_error_no_books": "Keine Bücher in der Warteliste – nichts zu exportieren.",
         "pdf_error_lib": "ReportLab ist nicht installiert.\nBitte installiere es mit:\n\npip install reportlab",
-        "pdf_saved": "PDF erfolgreich gespeichert."
+        "pdf_saved": "PDF erfolgreich gespeichert.",
+        "pdf_cancelled": "PDF-Export abgebrochen.",
+        "pdf_running": "PDF-Export läuft bereits.",
+        "import_running": "Import läuft bereits.",
+        "catalog": "🔎 Katalog",
+        "catalog_search": "🔎 Suchen",
+        "catalog_years": "Zeitraum:",
+        "catalog_rebuild": "📚 Ordner einlesen",
+        "catalog_hits": "{count} Treffer ({ms:.0f} ms)",
+        "catalog_running": "Katalog wird bereits eingelesen.",
+        "col_place": "Ort",
+        "col_type": "Typ",
+        "col_period": "Zeitraum",
+        "col_folder": "Ordner",
+        "stats": ("📊 {pages} Seiten · {pages_per_s:.1f} Seiten/s · {mb_per_s:.2f} MB/s · "
+                  "TTFB {ttfb} ms · HTML {html} ms · Parsen {parse} ms · "
+                  "Schreiben {disk:.1f} s · Wiederholungen {retries} · Fehler {failed}")
     },
     "en": {
         "title": "📚 PortaFontium Downloader",
@@ -72,12 +256,14 @@ LANG = {
         "save_list": "💾 Save Waiting List",
         "load_list": "📂 Load Waiting List",
         "export_pdf": "📄 Export to PDF",
+        "bulk_import": "📥 Bulk import",
         "choose_dir": "📂 Choose Directory",
         "book_url": "Book URL:",
         "target_dir": "Target Directory:",
         "pages": "Pages:",
         "pages_hint": "(e.g. 1,5,8-10; empty = all)",
         "waiting_list": "Waiting List:",
+        "view_page": "Page {page}/{pages} · {count} books",
         "col_book": "Book / Map / Other",
         "col_pages": "Page(s)",
         "col_status": "Status",
@@ -88,9 +274,27 @@ LANG = {
         "error_no_url": "Please enter a book URL.",
         "error_no_selection": "Please select at least one book from the waiting list.",
         "save_log": "📄 Save log",
+        "book_log": "📁 Log per book",
+        "quality": "Quality:",
         "pdf_error_no_books": "No books in the waiting list – nothing to export.",
         "pdf_error_lib": "ReportLab is not installed.\nPlease install it with:\n\npip install reportlab",
-        "pdf_saved": "PDF saved successfully."
+        "pdf_saved": "PDF saved successfully.",
+        "pdf_cancelled": "PDF export cancelled.",
+        "pdf_running": "PDF export is already running.",
+        "import_running": "Import is already running.",
+        "catalog": "🔎 Catalog",
+        "catalog_search": "🔎 Search",
+        "catalog_years": "Years:",
+        "catalog_rebuild": "📚 Scan folder",
+        "catalog_hits": "{count} hits ({ms:.0f} ms)",
+        "catalog_running": "Catalog scan is already running.",
+        "col_place": "Place",
+        "col_type": "Type",
+        "col_period": "Years",
+        "col_folder": "Folder",
+        "stats": ("📊 {pages} pages · {pages_per_s:.1f} pages/s · {mb_per_s:.2f} MB/s · "
+                  "TTFB {ttfb} ms · HTML {html} ms · parse {parse} ms · "
+                  "disk {disk:.1f} s · retries {retries} · errors {failed}")
     },
     "cs": {
         "title": "📚 PortaFontium Downloader",
@@ -104,12 +308,14 @@ LANG = {
         "save_list": "💾 Uložit seznam",
         "load_list": "📂 Načíst seznam",
         "export_pdf": "📄 Exportovat do PDF",
+        "bulk_import": "📥 Hromadný import",
         "choose_dir": "📂 Vybrat složku",
         "book_url": "URL knihy:",
         "target_dir": "Cílová složka:",
         "pages": "Stránky:",
         "pages_hint": "(např. 1,5,8-10; prázdné = všechny)",
         "waiting_list": "Seznam:",
+        "view_page": "Strana {page}/{pages} · {count} knih",
         "col_book": "Kniha / Mapa / Jiný",
         "col_pages": "Stránky",
         "col_status": "Stav",
@@ -120,9 +326,27 @@ LANG = {
         "error_no_url": "Zadejte prosím URL knihy.",
         "error_no_selection": "Vyberte alespoň jednu knihu ze seznamu.",
         "save_log": "📄 Uložit log",
+        "book_log": "📁 Log pro knihu",
+        "quality": "Kvalita:",
         "pdf_error_no_books": "Žádné knihy v seznamu – nic k exportu.",
         "pdf_error_lib": "ReportLab není nainstalován.\nNainstalujte jej příkazem:\n\npip install reportlab",
-        "pdf_saved": "PDF bylo úspěšně uloženo."
+        "pdf_saved": "PDF bylo úspěšně uloženo.",
+        "pdf_cancelled": "Export do PDF byl přerušen.",
+        "pdf_running": "Export do PDF již probíhá.",
+        "import_running": "Import již probíhá.",
+        "catalog": "🔎 Katalog",
+        "catalog_search": "🔎 Hledat",
+        "catalog_years": "Období:",
+        "catalog_rebuild": "📚 Načíst složku",
+        "catalog_hits": "{count} výsledků ({ms:.0f} ms)",
+        "catalog_running": "Katalog se již načítá.",
+        "col_place": "Místo",
+        "col_type": "Typ",
+        "col_period": "Období",
+        "col_folder": "Složka",
+        "stats": ("📊 {pages} stran · {pages_per_s:.1f} stran/s · {mb_per_s:.2f} MB/s · "
+                  "TTFB {ttfb} ms · HTML {html} ms · parsování {parse} ms · "
+                  "zápis {disk:.1f} s · opakování {retries} · chyby {failed}")
     }
 }
 
@@ -202,6 +426,79 @@ DOC_TYPES = {
     },
 }
 
+# Ergebnis-Cache für classify_doc_type (Buchtyp-Texte wiederholen sich stark)
+DOC_TYPE_CACHE_SIZE = 4096
+
+
+def fold_accents(text):
+    """Kleinschreibung ohne diakritische Zeichen: "Zemřelých" -> "zemrelych"."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+
+def doc_type_patterns():
+    """
+    Alle Suchmuster aus DOC_TYPES in Rangfolge: zuerst die Schlüssel,
+    dann die Aliase, dann die Bezeichnungen (cs, de, en), jeweils in der
+    Reihenfolge von DOC_TYPES. Rückgabe: [(muster, typ), ...].
+    """
+    patterns = [(key, data) for key, data in DOC_TYPES.items()]
+    patterns += [(alias, data) for data in DOC_TYPES.values() for alias in data["aliases"]]
+    patterns += [(data[lang].lower(), data) for data in DOC_TYPES.values() for lang in ("cs", "de", "en")]
+    return patterns
+
+
+class DocTypeMatcher:
+    """
+    Sucht viele Muster gleichzeitig: Index über die ersten n Zeichen jedes
+    Musters (n = kürzestes Muster), je Textposition werden nur die Muster
+    mit passendem Anfang geprüft, ranghöchstes zuerst. Liefert den Rang
+    (Index in patterns) des ranghöchsten Treffers oder None.
+    """
+
+    def __init__(self, patterns):
+        self.width = min(len(p) for p, _ in patterns)
+        index = {}
+        for rank, (pattern, _) in enumerate(patterns):
+            index.setdefault(pattern[:self.width], []).append((rank, pattern))
+        self.index = {k: tuple(v) for k, v in index.items()}
+        self.misses = len(patterns)
+
+    def best(self, text):
+        best = self.misses
+        get = self.index.get
+        width = self.width
+        for i in range(len(text) - width + 1):
+            for rank, pattern in get(text[i:i + width], ()):
+                if rank >= best:
+                    break
+                if text.startswith(pattern, i):
+                    best = rank
+                    break
+        return best if best < self.misses else None
+
+
+DOC_TYPE_PATTERNS = doc_type_patterns()
+DOC_TYPE_MATCHER = DocTypeMatcher(DOC_TYPE_PATTERNS)
+DOC_TYPE_MATCHER_FOLDED = DocTypeMatcher([(fold_accents(p), data) for p, data in DOC_TYPE_PATTERNS])
+
+
+@lru_cache(maxsize=DOC_TYPE_CACHE_SIZE)
+def classify_doc_type(primary_type):
+    """
+    Buchtyp-Text -> Eintrag aus DOC_TYPES (de/cs/en). Rangfolge wie
+    bisher: Schlüssel vor Aliasen vor Bezeichnungen, innerhalb einer Stufe
+    die Reihenfolge in DOC_TYPES. Passt nichts, wird ohne diakritische
+    Zeichen erneut gesucht ("Matrika zemrelych"), sonst bleibt der Text
+    in allen drei Sprachen stehen.
+    """
+    rank = DOC_TYPE_MATCHER.best(primary_type.lower())
+    if rank is None:
+        rank = DOC_TYPE_MATCHER_FOLDED.best(fold_accents(primary_type))
+    if rank is not None:
+        return DOC_TYPE_PATTERNS[rank][1]
+    return {"de": primary_type, "cs": primary_type, "en": primary_type}
+
 
 def sanitize_name(name: str) -> str:
     name = str(name or "").strip()
@@ -226,30 +523,168 @@ def is_porta_fontium(url: str) -> bool:
     return "portafontium.eu" in url
 
 
+def parse_retry_after(value):
+    """Retry-After (Sekunden oder HTTP-Datum) -> Sekunden oder None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, retry_after=None):
+    """Wartezeit vor Versuch attempt + 1: Retry-After oder 2^n mit Jitter."""
+    if retry_after is not None:
+        return min(retry_after, RETRY_AFTER_MAX)
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def sleep_backoff(delay, controller=None):
+    if controller:
+        controller.sleep(delay)
+    else:
+        time.sleep(delay)
+
+
+def request_with_retry(get, url, retries=DOWNLOAD_RETRIES, controller=None, metrics=None,
+                       **kwargs):
+    """
+    get(url, **kwargs) mit Wiederholung bei Verbindungsfehlern und
+    429/5xx. Nach dem letzten Versuch wird die Antwort (bzw. der
+    Fehler) unverändert an den Aufrufer gegeben.
+    """
+    for attempt in range(retries):
+        # nach Stopp keine Wiederholung mehr (acquire würde ebenfalls abbrechen)
+        if controller and controller.stop_flag():
+            raise DownloadCancelled()
+        host = controller.acquire(url) if controller else None
+        retry_after = None
+        failed = True
+        try:
+            r = get(url, **kwargs)
+            if r.status_code not in RETRY_STATUS or attempt == retries - 1:
+                failed = r.status_code in RETRY_STATUS
+                return r
+            retry_after = parse_retry_after(r.headers.get("Retry-After"))
+            r.close()  # verworfene Antwort (stream=True) gibt ihre Verbindung frei
+        except Exception:
+            if attempt == retries - 1:
+                raise
+        finally:
+            # Latenz nur von Bilddownloads auswerten (HTML ist nicht vergleichbar)
+            if controller:
+                controller.release(host, None, failed, retry_after)
+        if metrics:
+            metrics.inc("retries_total")
+        sleep_backoff(backoff_delay(attempt, retry_after), controller)
+
+
+def fetch_page(url, session, headers=None, controller=None, metrics=None):
+    """GET mit optionalen Cache-Headern; 304 wird nicht als Fehler gewertet."""
+    r = request_with_retry(session.get, url, controller=controller, metrics=metrics,
+                           timeout=20, headers=headers)
+    if r.status_code != 304:
+        r.raise_for_status()
+    return r
+
+
 def fetch_html(url, session):
-    r = session.get(url, timeout=20)
-    r.raise_for_status()
-    return r.text
+    return fetch_page(url, session).text
 
 
-def find_iip_links(html, base_url):
-    soup = BeautifulSoup(html, "html.parser")
+def create_session(max_connections=DEFAULT_MAX_CONNECTIONS, pool_hosts=HTTP_POOL_HOSTS,
+                   keepalive=HTTP_KEEPALIVE):
+    """
+    requests-Session für alle Anfragen eines Laufs: je Host ein Pool mit
+    max_connections Verbindungen (= globales Limit), für pool_hosts Hosts;
+    TCP-Keepalive hält ruhende Verbindungen offen.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.connection import HTTPConnection
 
+    options = list(HTTPConnection.default_socket_options)
+    if keepalive:
+        options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+
+    class TunedAdapter(HTTPAdapter):
+        def init_poolmanager(self, *args, **kwargs):
+            kwargs["socket_options"] = options
+            super().init_poolmanager(*args, **kwargs)
+
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    adapter = TunedAdapter(pool_connections=pool_hosts, pool_maxsize=max_connections)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+_read_buffers = threading.local()
+
+
+def iter_body(r, chunk_size=None):
+    """
+    Liefert den Antwortkörper in großen Blöcken. Ohne Content-Encoding per
+    readinto() in einen wiederverwendeten Puffer des Threads (die Blöcke
+    sind memoryviews und nur bis zum nächsten Schritt gültig), sonst
+    über iter_content (dekomprimiert).
+    """
+    size = chunk_size or DOWNLOAD_CHUNK
+    encoding = r.headers.get("Content-Encoding", "").strip().lower()
+    if encoding not in ("", "identity") or not hasattr(r.raw, "readinto"):
+        yield from r.iter_content(chunk_size=size)
+        return
+    buf = getattr(_read_buffers, "buf", None)
+    if buf is None or len(buf) != size:
+        buf = _read_buffers.buf = bytearray(size)
+    view = memoryview(buf)
+    while True:
+        n = r.raw.readinto(buf)
+        if not n:
+            break
+        yield view[:n]
+
+
+def parse_html(html, parse_only=None, parser=None):
+    """Baut den BeautifulSoup-Baum mit dem schnellsten verfügbaren Backend."""
+    from bs4 import BeautifulSoup
+
+    return BeautifulSoup(html, parser or HTML_PARSER, parse_only=parse_only)
+
+
+def find_iip_links(html, base_url, soup=None, session=None):
+    """
+    Sucht die Bildlinks einer Seite. Ein bereits geparster Baum (soup)
+    wird wiederverwendet, sonst werden nur <a>/<img> geparst. METS-Links
+    werden über session (Verbindungen wiederverwenden) nachgeladen.
+    """
     # 1) GDA IIIF image detection (Porta Fontium Foto pages)
-    m = re.search(r'https://www\.gda\.bayern\.de/digitalisat/(?:iiif|jpeg)/[^"\s]+', html)
+    gda = re.escape(GDA_BASE)
+    m = re.search(gda + r'/digitalisat/(?:iiif|jpeg)/[^"\s]+', html)
     if m:
         return [m.group(0)]
 
     # 2) METS link detection (DFG viewer style)
-    mets = re.search(r'https://www\.gda\.bayern\.de/mets/[0-9a-f-]+', html)
+    mets = re.search(gda + r'/mets/[0-9a-f-]+', html)
     if mets:
-        return extract_dfg_images(mets.group(0))
+        return extract_dfg_images(mets.group(0), session)
 
     # 3) direct DFG viewer embed
     if ("dfg-viewer.de" in base_url):
-        return extract_dfg_images(base_url)
+        return extract_dfg_images(base_url, session)
 
     # 4) classic Porta Fontium images
+    if soup is None:
+        from bs4 import SoupStrainer
+
+        soup = parse_html(html, parse_only=SoupStrainer(["a", "img"]))
     links = []
     tags = soup.find_all(["a", "img"])
     for tag in tags:
@@ -262,32 +697,304 @@ def find_iip_links(html, base_url):
     return list(dict.fromkeys(links))
 
 
-def extract_dfg_images(url):
+def dfg_mets_url(url):
+    """METS-Adresse aus einem DFG-Viewer-Link (tx_dlf[id]=... bzw. set[mets]=...)."""
+    qs = parse_qs(urlparse(url).query)
+    for key in ("tx_dlf[id]", "set[mets]"):
+        if qs.get(key):
+            return qs[key][0]
+    return None
+
+
+def parse_mets_pages(source):
+    """
+    Alle Seitenbilder eines METS-Dokuments in physischer Reihenfolge.
+    source: Pfad oder Datei-Objekt (auch ein HTTP-Stream). Gelesen wird
+    mit iterparse; fertige <mets:file>/<mets:div>-Elemente werden sofort
+    aus dem Baum entfernt, im Speicher bleibt nur Datei-ID -> URL.
+    Bildgruppe nach METS_FILE_GROUPS; ohne PHYSICAL-structMap gilt die
+    Reihenfolge der fileGrp. IIIF-Bild-URLs werden auf die Basis gekürzt.
+    """
+    groups = {}     # USE -> {Datei-ID: URL}, nur Bilddateien
+    pages = []      # (ORDER, Position, [Datei-IDs])
+    stack = []
+    use = None
+    physical = False
+
+    for event, elem in ET.iterparse(source, events=("start", "end")):
+        tag = elem.tag
+        if event == "start":
+            stack.append(elem)
+            if tag == METS_NS + "fileGrp":
+                use = (elem.get("USE") or "").upper()
+            elif tag == METS_NS + "structMap":
+                physical = (elem.get("TYPE") or "").upper() == "PHYSICAL"
+            continue
+
+        stack.pop()
+        parent = stack[-1] if stack else None
+        done = True
+        if tag == METS_NS + "file":
+            mime = (elem.get("MIMETYPE") or "").lower()
+            loc = elem.find(METS_NS + "FLocat")
+            href = loc.get(XLINK_HREF) if loc is not None else None
+            if href and (mime.startswith("image/") or (not mime and use in METS_FILE_GROUPS)):
+                groups.setdefault(use, {})[elem.get("ID")] = href
+        elif tag == METS_NS + "div" and physical and elem.find(METS_NS + "fptr") is not None:
+            order = elem.get("ORDER") or ""
+            pages.append((int(order) if order.isdigit() else len(pages) + 1, len(pages),
+                          [f.get("FILEID") for f in elem.iterfind(METS_NS + "fptr")]))
+        elif parent is not None and parent.tag in (METS_NS + "file", METS_NS + "div"):
+            # FLocat / fptr / Unter-divs braucht das Elternelement noch
+            done = False
+        if done and parent is not None:
+            parent.remove(elem)
+
+    if not groups:
+        return []
+    files = next((groups[g] for g in METS_FILE_GROUPS if g in groups), next(iter(groups.values())))
+
+    if pages:
+        hrefs = []
+        for _, _, ids in sorted(pages):
+            href = next((files[i] for i in ids if i in files), None)
+            if href:
+                hrefs.append(href)
+    else:
+        hrefs = list(files.values())
+
+    links = []
+    for href in hrefs:
+        m = IIIF_IMAGE_RE.match(href) if "/iiif/" in href else None
+        links.append(m.group("base") if m else href)
+    return list(dict.fromkeys(links))
+
+
+def extract_dfg_images(url, session=None):
+    """
+    Bildlinks eines METS-Dokuments (GDA /mets/..., DFG-Viewer-Link):
+    eine Anfrage, Antwort wird gestreamt geparst (parse_mets_pages).
+    Liefert der Server HTML statt METS, werden IIIF-Links darin gesucht.
+    """
+    session = session or create_session(1)
     try:
-        r = requests.get(url, timeout=15)
-        r.raise_for_status()
-    except:
+        r = request_with_retry(session.get, dfg_mets_url(url) or url, timeout=15, stream=True)
+    except Exception:
+        return []
+    if not r.ok:
+        r.close()  # Fehlerantwort: Verbindung freigeben, Körper nicht lesen
         return []
 
-    # Find IIIF image link inside JSON block
-    m = re.search(r'https://www\.gda\.bayern\.de/digitalisat/iiif/[0-9a-f-]+/[0-9]+', r.text)
+    with r:
+        ctype = r.headers.get("Content-Type", "").lower()
+        if "html" not in ctype:
+            r.raw.decode_content = True
+            try:
+                return parse_mets_pages(r.raw)
+            except Exception:  # kein gültiges XML / Verbindung abgebrochen
+                return []
+        text = r.text
+
+    # Find IIIF image links inside JSON block
+    links = re.findall(re.escape(GDA_BASE) + r'/digitalisat/iiif/[0-9a-f-]+/[0-9]+', text)
+    return list(dict.fromkeys(links))
+
+
+# IIIF-Bild-URL: <base>/<region>/<size>/<rotation>/<quality>.<format>
+IIIF_IMAGE_RE = re.compile(
+    r"^(?P<base>.+?)/(?:full|square|\d+,\d+,\d+,\d+|pct:[^/]+)/[^/]+/!?\d+/[^/]+\.(?:jpg|png)$")
+
+# IIIF Presentation API (v2/v3): Manifest-Adressen in Viewer-Seiten bzw. als Buch-URL
+IIIF_MANIFEST_RE = re.compile(r'https?://[^"\'\s<>]+?/manifest(?:\.json)?(?=$|["\'\s<>?#&])')
+IIIF_MANIFEST_PARAM_RE = re.compile(r'(?:[?&]|&amp;)manifest=([^&"\'\s<>]+)')
+# Canvases im Manifest: v2 sequences[].canvases[], v3 items[]
+IIIF_CANVAS_PREFIXES = ("sequences.item.canvases.item", "items.item")
+
+
+def is_iiif_image(url):
+    """IIIF-Bild-URL bzw. -Basis (GDA-Pfad /iiif/ oder vollständige Bild-URL)?"""
+    return "/iiif/" in url or IIIF_IMAGE_RE.match(url) is not None
+
+
+def find_iiif_manifest(html, base_url):
+    """Adresse eines IIIF-Manifests in der Seite (Link oder Viewer-Parameter ?manifest=) oder None."""
+    if "iiif" not in html.lower():
+        return None
+    m = IIIF_MANIFEST_PARAM_RE.search(html)
     if m:
-        return [m.group(0)]
+        return urljoin(base_url, unquote(m.group(1)))
+    m = IIIF_MANIFEST_RE.search(html)
+    return m.group(0) if m else None
+
 
-    return []
+def iiif_label(value):
+    """Text aus einem IIIF-Label (v2: String / [{"@value"}], v3: {"de": [...]})."""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, list):
+        return iiif_label(value[0]) if value else ""
+    if isinstance(value, dict):
+        if "@value" in value:
+            return str(value["@value"])
+        return next((iiif_label(v) for v in value.values()), "")
+    return ""
+
+
+def iiif_canvas_image(canvas):
+    """
+    (Bildlink, Breite, Höhe) eines Canvas oder None. Mit Image-Service
+    wird die volle Bild-URL gebildet (Profile / Kacheln greifen), sonst
+    die URL der Bildressource genommen.
+    """
+    if "images" in canvas:   # v2
+        annotations = canvas["images"]
+    else:                    # v3: AnnotationPage -> Annotation
+        annotations = [a for page in canvas.get("items") or [] for a in page.get("items") or []]
+    for ann in annotations:
+        body = ann.get("resource") or ann.get("body")
+        if isinstance(body, list):
+            body = body[0] if body else None
+        if isinstance(body, dict) and (body.get("type") == "Choice" or body.get("@type") == "oa:Choice"):
+            body = body.get("default") or (body.get("items") or body.get("item") or [None])[0]
+        if not isinstance(body, dict):
+            continue
+        service = body.get("service")
+        if isinstance(service, list):
+            service = service[0] if service else None
+        service_id = (service.get("@id") or service.get("id")) if isinstance(service, dict) else None
+        if service_id:
+            v3 = ("ImageService3" in str(service.get("type") or service.get("@type") or "")
+                  or "image/3" in str(service.get("@context") or ""))
+            link = f"{service_id.rstrip('/')}/full/{'max' if v3 else 'full'}/0/default.jpg"
+        else:
+            link = body.get("@id") or body.get("id")
+        if link:
+            width = body.get("width") or canvas.get("width") or 0
+            height = body.get("height") or canvas.get("height") or 0
+            return link, int(width), int(height)
+    return None
+
+
+def iter_iiif_manifest(fp, stream=None):
+    """
+    Liefert ("label", Wert) und ("canvas", dict) aus einem Manifest
+    (Datei-Objekt). Gestreamt (ijson): nur das jeweils aktuelle Canvas
+    liegt als Objekt im Speicher; sonst json.load.
+    """
+    if stream is None:
+        stream = HAVE_IJSON
+    if not stream:
+        doc = json.load(fp)
+        yield "label", doc.get("label")
+        for seq in (doc.get("sequences") or [])[:1]:
+            for canvas in seq.get("canvases") or []:
+                yield "canvas", canvas
+        for canvas in doc.get("items") or []:
+            if canvas.get("type") == "Canvas":
+                yield "canvas", canvas
+        return
+
+    import ijson
+
+    builder = target = None
+    first_sequence_done = False  # v2: wie json.load nur die erste Sequenz
+    for prefix, event, value in ijson.parse(fp):
+        if builder is None:
+            if prefix == "sequences.item" and event == "end_map":
+                first_sequence_done = True
+            elif first_sequence_done and prefix.startswith("sequences.item."):
+                continue
+            if prefix == "label" or (prefix in IIIF_CANVAS_PREFIXES and event == "start_map"):
+                if event not in ("start_map", "start_array"):
+                    yield "label", value
+                    continue
+                builder, target = ijson.ObjectBuilder(), prefix
+                builder.event(event, value)
+            continue
+        builder.event(event, value)
+        if prefix == target and event in ("end_map", "end_array"):
+            obj = builder.value
+            builder = None
+            if target == "label":
+                yield "label", obj
+            elif target == "items.item" and obj.get("type") != "Canvas":
+                continue
+            else:
+                yield "canvas", obj
 
 
-def build_download_url(iip_url):
+def load_iiif_manifest(url, session, controller=None, metrics=None):
+    """
+    Lädt ein IIIF-Presentation-Manifest (v2/v3) mit einer Anfrage.
+    Rückgabe {"label", "links", "sizes"} – je Canvas ein Bildlink und
+    [Breite, Höhe] – oder None (kein Manifest, Fehler, keine Bilder).
+    """
+    label = ""
+    links = []
+    sizes = []
+    try:
+        r = request_with_retry(session.get, url, controller=controller, metrics=metrics,
+                               timeout=30, stream=True)
+        with r:
+            r.raise_for_status()
+            r.raw.decode_content = True
+            length = r.headers.get("Content-Length", "")
+            stream = HAVE_IJSON and not (length.isdigit() and int(length) < IIIF_STREAM_MIN_BYTES)
+            for kind, value in iter_iiif_manifest(r.raw, stream):
+                if kind == "label":
+                    label = label or iiif_label(value)
+                    continue
+                image = iiif_canvas_image(value)
+                if image:
+                    links.append(image[0])
+                    sizes.append([image[1], image[2]])
+    except Exception:
+        return None
+    if not links:
+        return None
+    return {"label": label, "links": links, "sizes": sizes}
+
+
+def get_profile(profile=None):
+    """Profilname oder dict -> {"wid", "q", "iiif_quality"} (fehlende Werte = full)."""
+    if profile is None:
+        profile = DEFAULT_PROFILE
+    if isinstance(profile, str):
+        if profile not in QUALITY_PROFILES:
+            raise ValueError(f"Unbekanntes Profil: {profile}")
+        profile = QUALITY_PROFILES[profile]
+    merged = dict(QUALITY_PROFILES["full"])
+    merged.update({k: v for k, v in profile.items() if v is not None or k == "wid"})
+    return merged
+
+
+def profile_satisfies(have, want):
+    """True, wenn eine mit have geladene Seite für want gut genug ist."""
+    have = get_profile(have)
+    want = get_profile(want)
+    wid_ok = have["wid"] is None or (want["wid"] is not None and have["wid"] >= want["wid"])
+    return wid_ok and have["q"] >= want["q"] and have["iiif_quality"] == want["iiif_quality"]
+
+
+def build_download_url(iip_url, profile=None):
+    """Download-URL für IIP (WID, Q) bzw. IIIF (size, quality) nach Profil."""
+    p = get_profile(profile)
     parsed = urlparse(iip_url)
     qs = parse_qs(parsed.query)
     fif = qs.get("FIF", [None])[0]
     if not fif:
+        if is_iiif_image(iip_url) and (p["wid"] or p["iiif_quality"] != "default"):
+            m = IIIF_IMAGE_RE.match(iip_url)
+            iiif_base = m.group("base") if m else iip_url.rstrip("/")
+            size = f"{p['wid']}," if p["wid"] else "full"
+            return f"{iiif_base}/full/{size}/0/{p['iiif_quality']}.jpg"
         return iip_url
     base = parsed.scheme + "://" + parsed.netloc + parsed.path
-    return f"{base}?FIF={fif}&cvt=jpeg&Q=90"
+    wid = f"&WID={p['wid']}" if p["wid"] else ""
+    return f"{base}?FIF={fif}{wid}&cvt=jpeg&Q={p['q']}"
 
 
-def parse_pf_metadata(html: str, url: str) -> dict:
+def parse_pf_metadata(html: str, url: str, soup=None) -> dict:
     """
     Spezieller Parser für Porta fontium.
     Liest u.a.:
@@ -295,8 +1002,10 @@ def parse_pf_metadata(html: str, url: str) -> dict:
       - Buchtyp (Material / Form -> Typ)
       - Jahresbereich (Laufzeit / Datace)
       - Übersetzte Buchtypen: type_de, type_cz, type_en
+    Ein bereits geparster Baum (soup) wird wiederverwendet.
     """
-    soup = BeautifulSoup(html, "html.parser")
+    if soup is None:
+        soup = parse_html(html)
     meta = {
         "source": "Porta fontium",
         "url": url,
@@ -350,10 +1059,9 @@ def parse_pf_metadata(html: str, url: str) -> dict:
 
     if not place:
         for label_text in ("Místo:", "Místo", "Ort:", "Ort"):
-            label = soup.find(
-                lambda tag: tag.name in ("div", "span", "th", "td")
-                            and label_text in tag.get_text()
-            )
+            # gezielt den Textknoten suchen statt get_text() je Tag
+            text_node = soup.find(string=re.compile(re.escape(label_text)))
+            label = text_node.find_parent(("div", "span", "th", "td")) if text_node else None
             if label and label.parent:
                 full = label.parent.get_text(" ", strip=True)
                 rest = full.replace(label_text, "").strip(" :\u00a0")
@@ -409,37 +1117,8 @@ def parse_pf_metadata(html: str, url: str) -> dict:
             primary_type = "Matrik"  # fallback
         meta["book_type"] = primary_type
 
-    # Übersetzungen aus TYPE_TRANSLATIONS
-    def match_doc_type(primary_type):
-        text = primary_type.lower()
-
-        # 1. direktes Schlüsselwortmatching
-        for key, data in DOC_TYPES.items():
-            if key in text:
-                return data
-
-        # 2. Alias Matching
-        for key, data in DOC_TYPES.items():
-            if any(alias in text for alias in data["aliases"]):
-                return data
-
-        # 3. Sprach-Matching
-        for key, data in DOC_TYPES.items():
-            if data["cs"].lower() in text:
-                return data
-            if data["de"].lower() in text:
-                return data
-            if data["en"].lower() in text:
-                return data
-
-        # 4. Fallback
-        return {
-            "de": primary_type,
-            "cs": primary_type,
-            "en": primary_type
-        }
-
-    match = match_doc_type(primary_type)
+    # Übersetzungen aus DOC_TYPES
+    match = classify_doc_type(primary_type)
 
     meta["type_de"] = match["de"]
     meta["type_cz"] = match["cs"]
@@ -469,12 +1148,11 @@ def parse_pf_metadata(html: str, url: str) -> dict:
 
     # ---------- Material-Block für Log ----------
     material_section = None
+    legends = [(leg, leg.string.lower()) for leg in soup.find_all("legend") if leg.string]
     for legend_label in ("Materiál / forma", "Material / Form", "Materiál / form",
                          "Materiál / Forma", "Material / forma"):
-        leg = soup.find(
-            "legend",
-            string=lambda t: t and legend_label.lower() in t.lower()
-        )
+        legend_label = legend_label.lower()
+        leg = next((leg for leg, text in legends if legend_label in text), None)
         if leg:
             material_section = leg.find_parent("fieldset")
             if material_section:
@@ -488,12 +1166,13 @@ def parse_pf_metadata(html: str, url: str) -> dict:
     return meta
 
 
-def parse_generic_metadata(html: str, url: str) -> dict:
+def parse_generic_metadata(html: str, url: str, soup=None) -> dict:
     """
     Fallback-Parser für andere Seiten.
     Versucht nur Titel + ein paar Jahreszahlen.
     """
-    soup = BeautifulSoup(html, "html.parser")
+    if soup is None:
+        soup = parse_html(html)
     meta = {"source": "generic", "url": url}
 
     title = soup.title.string.strip() if soup.title and soup.title.string else None
@@ -506,41 +1185,1547 @@ def parse_generic_metadata(html: str, url: str) -> dict:
         meta["year_from"] = years[0]
         meta["year_to"] = years[-1]
 
-    # generische Typ-Bezeichnungen
-    meta["book_type"] = "Dokument"
-    meta["type_de"] = "Dokument"
-    meta["type_cz"] = "Dokument"
-    meta["type_en"] = "Document"
+    # generische Typ-Bezeichnungen
+    meta["book_type"] = "Dokument"
+    meta["type_de"] = "Dokument"
+    meta["type_cz"] = "Dokument"
+    meta["type_en"] = "Document"
+
+    return meta
+
+
+def is_complete_image(path, size=None):
+    """
+    Schnelle Prüfung, ob eine fertige Bilddatei vollständig ist:
+    nicht leer und bei JPEGs mit EOI-Marker (FF D9) am Ende.
+    """
+    try:
+        if size is None:
+            size = os.path.getsize(path)
+        if size <= 0:
+            return False
+        if not path.lower().endswith((".jpg", ".jpeg")):
+            return True
+        with open(path, "rb") as f:
+            f.seek(-2, os.SEEK_END)
+            return f.read(2) == b"\xff\xd9"
+    except OSError:
+        return False
+
+
+def is_jpeg_start(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read(2) == b"\xff\xd8"
+    except OSError:
+        return False
+
+
+def scan_complete_pages(folder):
+    """Liefert die Namen aller bereits vollständigen Bilder in folder."""
+    done = set()
+    try:
+        with os.scandir(folder) as it:
+            for entry in it:
+                if not entry.is_file() or entry.name.endswith(".part"):
+                    continue
+                if is_complete_image(entry.path, entry.stat().st_size):
+                    done.add(entry.name)
+    except OSError:
+        pass
+    return done
+
+
+class DownloadError(IOError):
+    """
+    Fehlgeschlagener Downloadversuch.
+    permanent = nicht wiederholen, discard = .part nicht fortsetzen (Inhalt kaputt)
+    """
+
+    def __init__(self, msg, status=None, retry_after=None, permanent=False, discard=False):
+        super().__init__(msg)
+        self.status = status
+        self.retry_after = retry_after
+        self.permanent = permanent
+        self.discard = discard
+
+
+class DownloadCancelled(DownloadError):
+    """Stopp gedrückt: es wird keine weitere Anfrage gesendet."""
+
+    def __init__(self):
+        super().__init__("Abgebrochen", permanent=True)
+
+
+def download_to_part(url, part, session, controller=None, expect_jpeg=True, metrics=None):
+    """
+    Ein Downloadversuch nach part. Ein vorhandenes part wird per
+    HTTP-Range fortgesetzt. Latenz / Fehler gehen an den controller,
+    TTFB, Übertragungsrate und Schreibzeit an metrics.
+    Prüft beim Streamen Content-Type, Content-Length und bei JPEGs
+    SOI/EOI-Marker. Rückgabe: SHA-256 (hex) der vollständigen Datei.
+    """
+    offset = os.path.getsize(part) if os.path.exists(part) else 0
+    headers = {"Range": f"bytes={offset}-"} if offset else None
+
+    host = controller.acquire(url) if controller else None
+    started = time.monotonic()
+    latency = None
+    retry_after = None
+    failed = True
+    written = 0
+    disk_time = 0.0
+    try:
+        with session.get(url, stream=True, timeout=60, headers=headers) as r:
+            latency = time.monotonic() - started
+            if offset and r.status_code == 416:
+                # Teildatei passt nicht (mehr) zum Server -> sofort neu beginnen
+                os.remove(part)
+                failed = False
+                raise DownloadError("Range nicht erfüllbar", 416, retry_after=0)
+            if r.status_code in RETRY_STATUS:
+                retry_after = parse_retry_after(r.headers.get("Retry-After"))
+                raise DownloadError(f"HTTP {r.status_code}", r.status_code, retry_after)
+            if 400 <= r.status_code < 500:
+                # z.B. 404: Wiederholen hilft nicht, Server ist aber gesund
+                failed = False
+                raise DownloadError(f"HTTP {r.status_code}", r.status_code, permanent=True)
+            r.raise_for_status()
+
+            # z.B. HTML-Fehlerseite mit Status 200
+            ctype = r.headers.get("Content-Type", "").split(";")[0].strip().lower()
+            if ctype and not (ctype.startswith("image/") or ctype == "application/octet-stream"):
+                raise DownloadError(f"Unerwarteter Inhalt: {ctype}", discard=True)
+
+            # Server ignoriert Range oder liefert anderen Ausschnitt -> von vorn
+            if offset and (r.status_code != 206 or not
+                           r.headers.get("Content-Range", "").startswith(f"bytes {offset}-")):
+                offset = 0
+
+            hasher = hashlib.sha256()
+            head = b""
+            if offset:
+                with open(part, "rb") as f:
+                    head = f.read(2)
+                    f.seek(0)
+                    for block in iter(lambda: f.read(HASH_CHUNK), b""):
+                        hasher.update(block)
+
+            expected = r.headers.get("Content-Length")
+            tail = b""
+            # Blöcke > Dateipuffer schreibt BufferedWriter direkt (ohne Kopie)
+            with open(part, "ab" if offset else "wb") as f:
+                for chunk in iter_body(r):
+                    if not chunk:
+                        continue
+                    if len(head) < 2:
+                        head += chunk[:2 - len(head)]
+                        if expect_jpeg and len(head) == 2 and head != b"\xff\xd8":
+                            raise DownloadError("Kein JPEG (SOI fehlt)", discard=True)
+                    t = time.perf_counter()
+                    f.write(chunk)
+                    disk_time += time.perf_counter() - t
+                    hasher.update(chunk)
+                    tail = bytes(chunk[-2:]) if len(chunk) >= 2 else (tail + chunk)[-2:]
+                    written += len(chunk)
+
+        if expected is not None and written != int(expected):
+            # zu kurz: später per Range fortsetzen; zu lang: verwerfen
+            raise DownloadError(f"Unvollständig: {written}/{expected} Bytes",
+                                discard=written > int(expected))
+        if expect_jpeg and tail != b"\xff\xd9":
+            raise DownloadError("JPEG unvollständig (EOI fehlt)", discard=True)
+        failed = False
+        if metrics:
+            transfer = time.monotonic() - started - latency
+            if transfer > 0 and written:
+                metrics.observe("transfer_bytes_per_second", written / transfer)
+        return hasher.hexdigest()
+    except DownloadError as e:
+        if e.discard and os.path.exists(part):
+            os.remove(part)
+        raise
+    finally:
+        if controller:
+            controller.release(host, latency, failed, retry_after)
+        if metrics:
+            if latency is not None:
+                metrics.observe("ttfb_seconds", latency)
+            metrics.inc("bytes_written_total", written)
+            metrics.inc("disk_write_seconds_total", disk_time)
+
+
+def download_image(url, path, session, retries=DOWNLOAD_RETRIES, controller=None,
+                   checksums=None, metrics=None):
+    """
+    Lädt nach path + ".<url-hash>.part" und benennt erst nach vollständigem,
+    geprüftem Download atomar in path um (der URL-Hash verhindert, dass
+    ein Teil-Download mit anderem Profil fortgesetzt wird). Fehlversuche
+    werden mit Backoff wiederholt. Mit checksums (dict) wird dort
+    Dateiname -> SHA-256 eingetragen.
+    """
+    part = f"{path}.{hashlib.sha1(url.encode('utf-8')).hexdigest()[:8]}.part"
+    expect_jpeg = path.lower().endswith((".jpg", ".jpeg"))
+    for attempt in range(retries):
+        if controller and controller.stop_flag():
+            return False
+        retry_after = None
+        try:
+            digest = download_to_part(url, part, session, controller, expect_jpeg, metrics)
+            os.replace(part, path)
+            if checksums is not None:
+                checksums[os.path.basename(path)] = digest
+            return True
+        except DownloadError as e:
+            if e.permanent:
+                return False
+            retry_after = e.retry_after
+        except Exception:
+            pass
+        if attempt == retries - 1:
+            return False
+        if metrics:
+            metrics.inc("retries_total")
+        sleep_backoff(backoff_delay(attempt, retry_after), controller)
+
+
+def resolve_tiles(dl_url, session, controller=None, metrics=None):
+    """
+    Fragt Bildgröße und Kachelraster beim Server ab.
+    IIP: obj=Max-size/Tile-size/Resolution-number, Kacheln per JTL.
+    IIIF: info.json, Kacheln per Region-Anfrage.
+    Rückgabe: {"width", "height", "tiles": [(x, y, w, h, url), ...]} oder None.
+    """
+    parsed = urlparse(dl_url)
+    fif = parse_qs(parsed.query).get("FIF", [None])[0]
+    base = parsed.scheme + "://" + parsed.netloc + parsed.path
+
+    try:
+        if fif:
+            r = request_with_retry(session.get, f"{base}?FIF={fif}&obj=IIP,1.0&obj=Max-size"
+                                                f"&obj=Tile-size&obj=Resolution-number",
+                                   controller=controller, metrics=metrics, timeout=20)
+            r.raise_for_status()
+            info = dict(line.split(":", 1) for line in r.text.splitlines() if ":" in line)
+            width, height = map(int, info["Max-size"].split()[:2])
+            tw, th = map(int, info["Tile-size"].split()[:2])
+            level = int(info["Resolution-number"]) - 1
+            cols = -(-width // tw)
+
+            def tile_url(x, y, w, h):
+                n = (y // th) * cols + x // tw
+                return f"{base}?FIF={fif}&JTL={level},{n}"
+        elif is_iiif_image(dl_url):
+            m = IIIF_IMAGE_RE.match(dl_url)
+            iiif_base = m.group("base") if m else dl_url.rstrip("/")
+            r = request_with_retry(session.get, iiif_base + "/info.json",
+                                   controller=controller, metrics=metrics, timeout=20)
+            r.raise_for_status()
+            info = r.json()
+            width, height = int(info["width"]), int(info["height"])
+            tile = (info.get("tiles") or [{}])[0]
+            tw = int(tile.get("width", 1024))
+            th = int(tile.get("height", tw))
+            v3 = "image/3" in json.dumps(info.get("@context", "")) or info.get("type") == "ImageService3"
+            size = "max" if v3 else "full"
+
+            def tile_url(x, y, w, h):
+                return f"{iiif_base}/{x},{y},{w},{h}/{size}/0/default.jpg"
+        else:
+            return None
+    except Exception:
+        return None
+
+    tiles = [(x, y, min(tw, width - x), min(th, height - y), None)
+             for y in range(0, height, th)
+             for x in range(0, width, tw)]
+    tiles = [(x, y, w, h, tile_url(x, y, w, h)) for x, y, w, h, _ in tiles]
+    return {"width": width, "height": height, "tiles": tiles}
+
+
+def download_tiled(source, path, session, executor, controller=None, checksums=None,
+                   stop_flag=lambda: False, metrics=None):
+    """
+    Lädt alle Kacheln parallel nach path + ".tiles/" (jede Kachel mit
+    eigenen Wiederholungen, vorhandene werden übersprungen) und setzt sie
+    zu path zusammen. Im Speicher liegen nur das Zielbild und eine Kachel;
+    prozessweit werden höchstens TILED_MAX_STITCHES Seiten gleichzeitig
+    zusammengesetzt.
+    """
+    from PIL import Image
+
+    tile_dir = path + TILE_DIR_SUFFIX
+    os.makedirs(tile_dir, exist_ok=True)
+    tile_paths = [os.path.join(tile_dir, f"tile_{n:05d}.jpg") for n in range(len(source["tiles"]))]
+
+    futures = []
+    for (x, y, w, h, url), tile_path in zip(source["tiles"], tile_paths):
+        if stop_flag():
+            return False
+        if is_complete_image(tile_path):
+            continue
+        futures.append(executor.submit(download_image, url, tile_path, session,
+                                       controller=controller, metrics=metrics))
+    if not all(f.result() for f in futures):
+        return False  # Kacheln bleiben für den nächsten Versuch liegen
+
+    part = path + ".part"
+    with TILED_STITCH_SLOTS:
+        if stop_flag():
+            return False
+        canvas = Image.new("RGB", (source["width"], source["height"]))
+        try:
+            for (x, y, w, h, _), tile_path in zip(source["tiles"], tile_paths):
+                with Image.open(tile_path) as tile:
+                    canvas.paste(tile if tile.mode == "RGB" else tile.convert("RGB"), (x, y))
+            canvas.save(part, "JPEG", quality=TILED_JPEG_QUALITY)
+        finally:
+            canvas.close()
+
+    digest = hash_file(part)
+    os.replace(part, path)
+    if checksums is not None:
+        checksums[os.path.basename(path)] = digest
+    shutil.rmtree(tile_dir, ignore_errors=True)
+    return True
+
+
+def hash_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_CHUNK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def read_checksums(folder):
+    """Liest checksums.sha256 (Format von sha256sum) -> {Dateiname: hex}."""
+    sums = {}
+    try:
+        with open(os.path.join(folder, CHECKSUM_FILE), "r", encoding="utf-8") as f:
+            for line in f:
+                digest, sep, name = line.rstrip("\n").partition("  ")
+                if sep and len(digest) == 64:
+                    sums[name.lstrip("*")] = digest
+    except OSError:
+        pass
+    return sums
+
+
+def read_page_quality(folder):
+    """page_quality.json: Dateiname -> Profil der Seiten, die nicht in full vorliegen."""
+    try:
+        with open(os.path.join(folder, PAGE_QUALITY_FILE), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def write_page_quality(folder, quality):
+    path = os.path.join(folder, PAGE_QUALITY_FILE)
+    if not quality:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    tmp = path + ".part"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(quality, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def write_checksums(folder, sums):
+    path = os.path.join(folder, CHECKSUM_FILE)
+    tmp = path + ".part"
+    with open(tmp, "w", encoding="utf-8") as f:
+        for name in sorted(sums):
+            f.write(f"{sums[name]}  {name}\n")
+    os.replace(tmp, path)
+
+
+def verify_tree(roots, repair=False, workers=None, log=None, stop_flag=lambda: False):
+    """
+    Prüft alle Bilder unter roots parallel: Dateien mit Eintrag in
+    checksums.sha256 per SHA-256, übrige JPEGs per SOI/EOI-Marker.
+    Mit repair werden fehlerhafte Seiten gelöscht, damit der nächste
+    Download (Überspringen vorhandener Seiten) nur diese neu lädt.
+    Rückgabe: (geprüft, Liste fehlerhafter Pfade)
+    """
+    log = log or (lambda msg: None)
+
+    checks = []  # (Pfad, erwarteter Hash oder None)
+    seen = set()
+    for root_dir in roots:
+        if not root_dir or not os.path.isdir(root_dir):
+            continue
+        for folder, dirs, files in os.walk(root_dir):
+            dirs[:] = [d for d in dirs if not d.endswith(TILE_DIR_SUFFIX)]
+            real = os.path.realpath(folder)
+            if real in seen:
+                continue
+            seen.add(real)
+            sums = read_checksums(folder) if CHECKSUM_FILE in files else {}
+            for name, digest in sums.items():
+                checks.append((os.path.join(folder, name), digest))
+            for name in files:
+                if name not in sums and name.lower().endswith((".jpg", ".jpeg")):
+                    checks.append((os.path.join(folder, name), None))
+
+    def check(item):
+        path, digest = item
+        if stop_flag():
+            return True
+        if digest is None:
+            return is_complete_image(path) and is_jpeg_start(path)
+        try:
+            return hash_file(path) == digest
+        except OSError:
+            return False
+
+    bad = []
+    with ThreadPoolExecutor(max_workers=workers or min(32, (os.cpu_count() or 1) * 2)) as pool:
+        for (path, _), ok in zip(checks, pool.map(check, checks)):
+            if ok:
+                continue
+            bad.append(path)
+            log(f"[!] Fehlerhaft: {path}")
+            if repair and os.path.exists(path):
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    log(f"[!] Löschen fehlgeschlagen: {path}: {e}")
+
+    log(f"[ℹ️] Prüfung: {len(checks)} Datei(en), {len(bad)} fehlerhaft.")
+    return len(checks), bad
+
+
+def clone_file(src, dst):
+    """
+    Legt dst als Hardlink auf src an, sonst als Reflink (Linux, FICLONE),
+    sonst als Kopie. dst wird atomar ersetzt. Rückgabe: Art der Ablage.
+    Die Zwischendatei ist je Prozess und Thread eindeutig, damit mehrere
+    Threads/Rechner dieselbe Datei gleichzeitig ablegen können.
+    """
+    tmp = f"{dst}.{os.getpid()}.{threading.get_ident()}.part"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    try:
+        try:
+            os.link(src, tmp)
+            kind = "link"
+        except OSError:
+            kind = None
+            if sys.platform.startswith("linux"):
+                try:
+                    import fcntl
+
+                    with open(src, "rb") as fs, open(tmp, "wb") as fd:
+                        fcntl.ioctl(fd.fileno(), 0x40049409, fs.fileno())  # FICLONE
+                    kind = "reflink"
+                except OSError:
+                    pass
+            if kind is None:
+                shutil.copyfile(src, tmp)
+                kind = "copy"
+        os.replace(tmp, dst)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    return kind
+
+
+class PageStore:
+    """
+    Inhaltsadressierter Seitenspeicher (optional, z.B. auf einem geteilten
+    Laufwerk). Jede Seite liegt einmal unter objects/<sha256>.jpg, ein
+    Index ordnet Download-URL (IIP-FIF inkl. Parameter) -> SHA-256 zu.
+    In die Buchordner werden Hardlinks (bzw. Reflinks/Kopien) gelegt.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(os.path.join(directory, "objects"), exist_ok=True)
+        os.makedirs(os.path.join(directory, "index"), exist_ok=True)
+
+    def _object(self, digest):
+        return os.path.join(self.directory, "objects", digest[:2], digest + ".jpg")
+
+    def _index(self, url):
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, "index", key[:2], key)
+
+    def lookup(self, url):
+        """SHA-256 der Seite zu url, falls sie im Speicher liegt."""
+        try:
+            with open(self._index(url), "r", encoding="ascii") as f:
+                digest = f.read().strip()
+        except OSError:
+            return None
+        return digest if os.path.isfile(self._object(digest)) else None
+
+    def place(self, digest, path):
+        """
+        Legt die gespeicherte Seite digest als path ab. Das Objekt wird
+        vorher geprüft: Buchseiten sind Hardlinks auf das Objekt, eine
+        beschädigte Seite (z.B. von --verify gelöscht) beschädigt also auch
+        das Objekt. Stimmt der Hash nicht, wird es verworfen (False).
+        """
+        obj = self._object(digest)
+        try:
+            if hash_file(obj) != digest:
+                os.remove(obj)
+                return False
+            clone_file(obj, path)
+            return True
+        except OSError:
+            return False
+
+    def add(self, url, path, digest):
+        """
+        Übernimmt eine frisch geladene Seite. Gibt es den Inhalt schon
+        (andere URL, gleiches Bild), wird path durch einen Link ersetzt.
+        """
+        obj = self._object(digest)
+        os.makedirs(os.path.dirname(obj), exist_ok=True)
+        if os.path.isfile(obj):
+            clone_file(obj, path)
+        else:
+            try:
+                clone_file(path, obj)
+            except OSError:
+                # gleichzeitig von einem anderen Thread/Rechner abgelegt: gleicher Inhalt
+                if not os.path.isfile(obj):
+                    raise
+
+        index = self._index(url)
+        os.makedirs(os.path.dirname(index), exist_ok=True)
+        tmp = f"{index}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="ascii") as f:
+            f.write(digest)
+        os.replace(tmp, index)
+
+
+class HostController:
+    """
+    Regelt die Zahl gleichzeitiger Anfragen je Host (AIMD):
+    - erfolgreiche Anfrage mit normaler Latenz: Limit += 1 / Limit
+    - steigende Latenz (> LATENCY_TOLERANCE x Bestwert): Limit -= 1 / Limit
+    - Fehler / 429 / 5xx: Limit halbieren (höchstens einmal je Latenzfenster)
+    Retry-After sperrt den Host für alle Threads bis zum angegebenen Zeitpunkt.
+    """
+
+    def __init__(self, max_limit=DEFAULT_MAX_CONNECTIONS, min_limit=1,
+                 initial=AIMD_INITIAL_LIMIT, stop_flag=lambda: False, log=None):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.initial = float(max(self.min_limit, min(initial, self.max_limit)))
+        self.stop_flag = stop_flag
+        self.log = log or (lambda msg: None)
+        self.cond = threading.Condition()
+        self.hosts = {}
+
+    def _state(self, host):
+        st = self.hosts.get(host)
+        if st is None:
+            st = self.hosts[host] = {
+                "limit": self.initial,
+                "in_flight": 0,
+                "latency": None,       # gleitender Mittelwert (s)
+                "baseline": None,      # beste beobachtete Latenz (s)
+                "blocked_until": 0.0,
+                "last_decrease": 0.0,
+            }
+        return st
+
+    def acquire(self, url):
+        host = urlparse(url).netloc
+        with self.cond:
+            st = self._state(host)
+            while True:
+                # Stopp: keine neue Anfrage statt am Limit vorbei (gedrosselte Hosts schonen)
+                if self.stop_flag():
+                    raise DownloadCancelled()
+                blocked = st["blocked_until"] - time.monotonic()
+                if blocked <= 0 and st["in_flight"] < int(st["limit"]):
+                    break
+                self.cond.wait(min(blocked, 0.5) if blocked > 0 else 0.5)
+            st["in_flight"] += 1
+        return host
+
+    def release(self, host, latency=None, failed=False, retry_after=None):
+        with self.cond:
+            st = self._state(host)
+            st["in_flight"] = max(0, st["in_flight"] - 1)
+            now = time.monotonic()
+            old = st["limit"]
+
+            if retry_after:
+                st["blocked_until"] = max(st["blocked_until"],
+                                          now + min(retry_after, RETRY_AFTER_MAX))
+
+            if failed:
+                if now - st["last_decrease"] >= (st["latency"] or 1.0):
+                    st["limit"] = max(self.min_limit, old * AIMD_DECREASE)
+                    st["last_decrease"] = now
+            elif latency is not None:
+                avg = st["latency"]
+                st["latency"] = latency if avg is None else 0.8 * avg + 0.2 * latency
+                base = st["baseline"]
+                if base is None or latency < base:
+                    st["baseline"] = latency
+                else:
+                    # Bestwert langsam nachführen (Netz kann sich ändern)
+                    st["baseline"] = base + (latency - base) * 0.01
+
+                if st["latency"] <= LATENCY_TOLERANCE * st["baseline"]:
+                    st["limit"] = min(self.max_limit, old + 1 / old)
+                else:
+                    st["limit"] = max(self.min_limit, old - 1 / old)
+
+            if int(st["limit"]) != int(old):
+                self.log(f"[~] {host}: {int(old)} -> {int(st['limit'])} parallele Anfragen")
+            self.cond.notify_all()
+
+    def sleep(self, delay):
+        """Wartet delay Sekunden, bricht bei Stopp vorzeitig ab."""
+        end = time.monotonic() + delay
+        while not self.stop_flag():
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                break
+            time.sleep(min(remaining, 0.25))
+
+    def snapshot(self):
+        with self.cond:
+            return {host: {"limit": int(st["limit"]),
+                           "in_flight": st["in_flight"],
+                           "latency_ms": round((st["latency"] or 0) * 1000, 1)}
+                    for host, st in self.hosts.items()}
+
+
+class Metrics:
+    """
+    Zähler und Histogramme eines Downloader-Laufs (threadsicher).
+    Namen und Buckets siehe METRIC_HELP / METRIC_BUCKETS; snapshot()
+    liefert einen JSON-fähigen Stand, z.B. für write_metrics().
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.finished = None
+        self.counters = {name: 0 for name in METRIC_HELP if name not in METRIC_BUCKETS}
+        self.histograms = {name: {"counts": [0] * (len(buckets) + 1), "sum": 0.0,
+                                  "count": 0, "max": 0.0}
+                           for name, buckets in METRIC_BUCKETS.items()}
+
+    def finish(self):
+        """Hält die Laufzeit an (Raten bleiben nach dem Lauf stabil)."""
+        self.finished = time.time()
+
+    def inc(self, name, value=1):
+        with self.lock:
+            self.counters[name] += value
+
+    def observe(self, name, value):
+        i = bisect.bisect_left(METRIC_BUCKETS[name], value)
+        with self.lock:
+            h = self.histograms[name]
+            h["counts"][i] += 1
+            h["sum"] += value
+            h["count"] += 1
+            h["max"] = max(h["max"], value)
+
+    @staticmethod
+    def quantile(buckets, counts, q):
+        """Schätzt ein Quantil aus den Buckets (linear innerhalb des Buckets)."""
+        total = sum(counts)
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for i, n in enumerate(counts):
+            if n and seen + n >= rank:
+                if i == len(buckets):
+                    return buckets[-1]
+                lower = buckets[i - 1] if i else 0.0
+                return lower + (buckets[i] - lower) * (rank - seen) / n
+            seen += n
+        return buckets[-1]
+
+    def snapshot(self):
+        with self.lock:
+            counters = dict(self.counters)
+            hists = {name: dict(h, counts=list(h["counts"])) for name, h in self.histograms.items()}
+        elapsed = max((self.finished or time.time()) - self.started, 1e-9)
+        histograms = {}
+        for name, h in hists.items():
+            buckets = METRIC_BUCKETS[name]
+            cumulative = []
+            seen = 0
+            for le, n in zip(list(buckets) + ["+Inf"], h["counts"]):
+                seen += n
+                cumulative.append([le, seen])
+            histograms[name] = {
+                "count": h["count"],
+                "sum": h["sum"],
+                "max": h["max"],
+                "p50": self.quantile(buckets, h["counts"], 0.5),
+                "p95": self.quantile(buckets, h["counts"], 0.95),
+                "buckets": cumulative,
+            }
+        return {
+            "started": datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+            "elapsed_s": round(elapsed, 3),
+            "pages_per_s": counters["pages_downloaded_total"] / elapsed,
+            "bytes_per_s": counters["bytes_written_total"] / elapsed,
+            "counters": counters,
+            "histograms": histograms,
+        }
+
+
+def metrics_to_prometheus(snapshot):
+    """Snapshot -> Prometheus-Textformat (für den node_exporter-Textfile-Collector)."""
+    lines = []
+    for name, value in snapshot["counters"].items():
+        metric = METRICS_PREFIX + name
+        lines += [f"# HELP {metric} {METRIC_HELP[name]}", f"# TYPE {metric} counter",
+                  f"{metric} {value}"]
+    for name, h in snapshot["histograms"].items():
+        metric = METRICS_PREFIX + name
+        lines += [f"# HELP {metric} {METRIC_HELP[name]}", f"# TYPE {metric} histogram"]
+        lines += [f'{metric}_bucket{{le="{le}"}} {n}' for le, n in h["buckets"]]
+        lines += [f"{metric}_sum {h['sum']}", f"{metric}_count {h['count']}"]
+    hosts = snapshot.get("hosts") or {}
+    for key, help_text in (("limit", "Aktuelles Verbindungslimit je Host"),
+                           ("in_flight", "Laufende Anfragen je Host"),
+                           ("latency_ms", "Gleitende Latenz je Host in Millisekunden")):
+        if not hosts:
+            break
+        metric = f"{METRICS_PREFIX}host_{key}"
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge"]
+        lines += [f'{metric}{{host="{host}"}} {st[key]}' for host, st in hosts.items()]
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics(path, snapshot):
+    """Schreibt den Snapshot atomar: *.json als JSON, sonst im Prometheus-Format."""
+    if path.lower().endswith(".json"):
+        text = json.dumps(snapshot, ensure_ascii=False, indent=1)
+    else:
+        text = metrics_to_prometheus(snapshot)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def format_metrics(snapshot, template=None):
+    """Einzeilige Zusammenfassung für GUI-Statuszeile und Kommandozeile."""
+    def ms(name, key="p50"):
+        value = snapshot["histograms"][name][key]
+        return "-" if value is None else f"{value * 1000:.0f}"
+
+    c = snapshot["counters"]
+    return (template or LANG["de"]["stats"]).format(
+        pages=c["pages_downloaded_total"],
+        pages_per_s=snapshot["pages_per_s"],
+        mb_per_s=snapshot["bytes_per_s"] / (1024 * 1024),
+        ttfb=ms("ttfb_seconds"),
+        html=ms("html_fetch_seconds"),
+        parse=ms("parse_seconds"),
+        disk=c["disk_write_seconds_total"],
+        retries=c["retries_total"],
+        failed=c["pages_failed_total"],
+    )
+
+
+def default_cache_dir():
+    base = (os.environ.get("LOCALAPPDATA")
+            or os.environ.get("XDG_CACHE_HOME")
+            or os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(base, "PortaFontiumDownloader")
+
+
+class ManifestCache:
+    """
+    Persistenter Cache: Buch-URL -> aufgelöste Bildlinks + Metadaten.
+    Eine JSON-Datei pro URL. Einträge jünger als ttl werden ohne
+    HTTP-Anfrage benutzt, ältere per ETag / If-Modified-Since
+    revalidiert. Überschreitet der Cache max_bytes, werden die am
+    längsten nicht benutzten Einträge gelöscht.
+    """
+
+    def __init__(self, directory=None, ttl=MANIFEST_CACHE_TTL,
+                 max_bytes=MANIFEST_CACHE_MAX_BYTES):
+        self.directory = directory or os.path.join(default_cache_dir(), "manifests")
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, url):
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, key + ".json")
+
+    def get(self, url):
+        path = self._path(url)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("url") != url or entry.get("format") != MANIFEST_CACHE_FORMAT:
+            return None
+        # Zugriffszeit für die Verdrängung merken
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def is_fresh(self, entry):
+        return time.time() - entry.get("stored", 0) < self.ttl
+
+    def validators(self, entry):
+        """Header für eine bedingte Anfrage (ETag / Last-Modified)."""
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def put(self, url, links, meta, response_headers=None, entry=None):
+        response_headers = response_headers or {}
+        entry = dict(entry or {})
+        entry.update({
+            "url": url,
+            "format": MANIFEST_CACHE_FORMAT,
+            "links": links,
+            "meta": meta,
+            "stored": time.time(),
+        })
+        if response_headers.get("ETag"):
+            entry["etag"] = response_headers["ETag"]
+        if response_headers.get("Last-Modified"):
+            entry["last_modified"] = response_headers["Last-Modified"]
+
+        path = self._path(url)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        except OSError:
+            return
+        self.evict()
+
+    def evict(self):
+        with self.lock:
+            entries = []
+            total = 0
+            try:
+                with os.scandir(self.directory) as it:
+                    for e in it:
+                        if e.is_file() and e.name.endswith(".json"):
+                            st = e.stat()
+                            entries.append((st.st_mtime, st.st_size, e.path))
+                            total += st.st_size
+            except OSError:
+                return
+            if total <= self.max_bytes:
+                return
+            for _, size, path in sorted(entries):
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+    def clear(self):
+        with self.lock:
+            for name in os.listdir(self.directory):
+                if name.endswith(".json"):
+                    try:
+                        os.remove(os.path.join(self.directory, name))
+                    except OSError:
+                        pass
+
+
+class LogSink:
+    """
+    Schreibt Logzeilen in einem Hintergrund-Thread in eine oder mehrere
+    Dateien. Die Dateien bleiben gepuffert geöffnet, werden alle
+    flush_interval Sekunden geleert und ab max_bytes rotiert
+    (datei.1 ... datei.<backups>).
+    """
+
+    def __init__(self, max_bytes=LOG_MAX_BYTES, backups=LOG_BACKUPS,
+                 flush_interval=LOG_FLUSH_INTERVAL, max_open=LOG_MAX_OPEN_FILES):
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_interval = flush_interval
+        self.max_open = max_open
+        self.queue = queue.Queue()
+        self.files = OrderedDict()  # Pfad -> [Dateiobjekt, Größe]
+        self.thread = threading.Thread(target=self._worker, name="LogSink", daemon=True)
+        self.thread.start()
+
+    def write(self, path, lines):
+        if isinstance(lines, str):
+            lines = [lines]
+        self.queue.put(("write", path, lines))
+
+    def flush(self, wait=False):
+        done = threading.Event()
+        self.queue.put(("flush", done))
+        if wait:
+            done.wait(10)
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join(10)
+
+    def _worker(self):
+        last_flush = time.monotonic()
+        while True:
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = ("flush", None)
+
+            if item is None:
+                self._close_all()
+                return
+
+            if item[0] == "write":
+                _, path, lines = item
+                try:
+                    self._write(path, lines)
+                except OSError:
+                    self._close(path)
+
+            if item[0] == "flush" or time.monotonic() - last_flush >= self.flush_interval:
+                self._flush_all()
+                last_flush = time.monotonic()
+                if item[0] == "flush" and item[1] is not None:
+                    item[1].set()
+
+    def _open(self, path):
+        entry = self.files.get(path)
+        if entry:
+            self.files.move_to_end(path)
+            return entry
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        f = open(path, "a", encoding="utf-8", buffering=64 * 1024)
+        entry = self.files[path] = [f, f.tell()]
+        # nicht beliebig viele Dateien offen halten (Log je Buch)
+        while len(self.files) > self.max_open:
+            self._close(next(iter(self.files)))
+        return entry
+
+    def _write(self, path, lines):
+        entry = self._open(path)
+        data = "\n".join(lines) + "\n"
+        entry[0].write(data)
+        entry[1] += len(data.encode("utf-8"))
+        if self.max_bytes and entry[1] >= self.max_bytes:
+            self._rotate(path)
+
+    def _rotate(self, path):
+        self._close(path)
+        for i in range(self.backups - 1, 0, -1):
+            src = f"{path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(path, f"{path}.1")
+        else:
+            os.remove(path)
+
+    def _close(self, path):
+        entry = self.files.pop(path, None)
+        if entry:
+            try:
+                entry[0].close()
+            except OSError:
+                pass
+
+    def _flush_all(self):
+        for path, (f, _) in list(self.files.items()):
+            try:
+                f.flush()
+            except OSError:
+                self._close(path)
+
+    def _close_all(self):
+        for path in list(self.files):
+            self._close(path)
+
+
+class JobStore:
+    """
+    Persistente Warteliste in SQLite: Bücher, aufgelöste Seitenlisten und
+    Zustand je Seite (pending/done/failed, Bytes, SHA-256). Jede Änderung
+    ist eine eigene Transaktion, nach einem Absturz geht nichts verloren.
+    Eine Verbindung für alle Threads, Zugriffe über self.lock serialisiert.
+    Mehrere Prozesse / Rechner teilen sich eine Datei über claim_book()
+    (Lease + Heartbeat). Über ein Netzlaufwerk nur mit wal=False: WAL
+    braucht gemeinsamen Speicher und funktioniert nur auf einem Rechner.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS books (
+            id       INTEGER PRIMARY KEY,
+            url      TEXT NOT NULL,
+            outdir   TEXT NOT NULL DEFAULT '',
+            pages    TEXT NOT NULL DEFAULT '',
+            profile  TEXT,
+            status   TEXT NOT NULL DEFAULT 'pending',
+            folder   TEXT,
+            added    REAL NOT NULL,
+            updated  REAL NOT NULL,
+            worker   TEXT,
+            lease_until REAL
+        );
+        CREATE TABLE IF NOT EXISTS pages (
+            book_id  INTEGER NOT NULL REFERENCES books(id) ON DELETE CASCADE,
+            page_no  INTEGER NOT NULL,
+            fname    TEXT NOT NULL,
+            url      TEXT NOT NULL,
+            state    TEXT NOT NULL DEFAULT 'pending',
+            bytes    INTEGER,
+            sha256   TEXT,
+            error    TEXT,
+            updated  REAL NOT NULL,
+            PRIMARY KEY (book_id, page_no)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS pages_state ON pages(state);
+        CREATE INDEX IF NOT EXISTS books_status ON books(status);
+    """
+
+    def __init__(self, path=None, wal=True):
+        self.path = path or os.path.join(default_cache_dir(), JOB_DB_FILE)
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.lock = threading.Lock()
+        # timeout: andere Prozesse halten die Schreibsperre nur kurz
+        self.db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        # WAL: Leser blockieren Schreiber nicht, kein fsync je Seite
+        self.db.execute(f"PRAGMA journal_mode={'WAL' if wal else 'DELETE'}")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("PRAGMA foreign_keys=ON")
+        version = self.db.execute("PRAGMA user_version").fetchone()[0]
+        if version > JOB_DB_VERSION:
+            raise sqlite3.DatabaseError(f"{self.path}: neuere Version ({version})")
+        with self.db:
+            self.db.executescript(self.SCHEMA)
+            self.db.execute(f"PRAGMA user_version={JOB_DB_VERSION}")
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    @staticmethod
+    def _book(row):
+        book = {"id": row["id"], "url": row["url"], "outdir": row["outdir"],
+                "pages": row["pages"], "status": row["status"]}
+        if row["profile"]:
+            book["profile"] = row["profile"]
+        return book
+
+    # --- Bücher ---
+
+    def add_books(self, books):
+        """Fügt Bücher (dicts wie in der Warteliste) an; setzt book["id"]."""
+        with self.lock, self.db:
+            self._insert_books(books)
+        return books
+
+    def _insert_books(self, books):
+        """INSERT ohne eigene Transaktion; Aufrufer hält self.lock."""
+        now = time.time()
+        for b in books:
+            cur = self.db.execute(
+                "INSERT INTO books (url, outdir, pages, profile, status, added, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (b["url"], b.get("outdir", ""), b.get("pages", ""), b.get("profile"),
+                 BOOK_PENDING, now, now))
+            b["id"] = cur.lastrowid
+            b["status"] = BOOK_PENDING
+
+    def add_new_books(self, books):
+        """
+        Wie add_books, überspringt aber Bücher mit gleicher URL und gleichem
+        Zielordner. Atomar, damit gleichzeitig startende Worker dieselbe
+        Liste übergeben können. Rückgabe: neu angelegte Bücher.
+        """
+        now = time.time()
+        added = []
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                known = {tuple(r) for r in self.db.execute("SELECT url, outdir FROM books")}
+                for b in books:
+                    key = (b["url"], b.get("outdir", ""))
+                    if key in known:
+                        continue
+                    known.add(key)
+                    cur = self.db.execute(
+                        "INSERT INTO books (url, outdir, pages, profile, status, added, updated) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (*key, b.get("pages", ""), b.get("profile"), BOOK_PENDING, now, now))
+                    b["id"] = cur.lastrowid
+                    b["status"] = BOOK_PENDING
+                    added.append(b)
+                self.db.commit()
+            except BaseException:
+                self.db.rollback()
+                raise
+        return added
+
+    def books(self, statuses=None):
+        """Alle Bücher in Reihenfolge der Warteliste (optional nach Status gefiltert)."""
+        sql = "SELECT * FROM books"
+        args = ()
+        if statuses:
+            sql += f" WHERE status IN ({','.join('?' * len(statuses))})"
+            args = tuple(statuses)
+        with self.lock:
+            rows = self.db.execute(sql + " ORDER BY id", args).fetchall()
+        return [self._book(r) for r in rows]
+
+    def update_book(self, book_id, **fields):
+        """Ändert Spalten eines Buches, z.B. pages=..., status=..., folder=..."""
+        if not fields:
+            return
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        with self.lock, self.db:
+            self.db.execute(f"UPDATE books SET {cols}, updated = ? WHERE id = ?",
+                            (*fields.values(), time.time(), book_id))
+
+    def book_status(self, book_id):
+        with self.lock:
+            row = self.db.execute("SELECT status FROM books WHERE id = ?", (book_id,)).fetchone()
+        return row["status"] if row else None
+
+    # --- Worker-Modus ---
+
+    def claim_book(self, worker, lease=WORKER_LEASE, retry_before=None):
+        """
+        Vergibt das nächste offene Buch an worker: neu, abgebrochen oder
+        "running" mit abgelaufener Lease. Mit retry_before zusätzlich
+        teilweise/fehlgeschlagene Bücher, die vor diesem Zeitpunkt zuletzt
+        liefen – wie ein erneuter Lauf ohne --worker, aber ohne ein in
+        dieser Sitzung gescheitertes Buch endlos neu zu vergeben.
+        Rückgabe: Buch (dict) oder None.
+        """
+        now = time.time()
+        with self.lock:
+            # IMMEDIATE: Schreibsperre sofort, damit kein Buch doppelt vergeben wird
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.db.execute(
+                    "SELECT * FROM books WHERE status IN (?, ?) "
+                    "OR (status = ? AND COALESCE(lease_until, 0) < ?) "
+                    "OR (status IN (?, ?) AND updated < ?) ORDER BY id LIMIT 1",
+                    (BOOK_PENDING, BOOK_CANCELLED, BOOK_RUNNING, now,
+                     BOOK_PARTIAL, BOOK_FAILED, retry_before or 0)).fetchone()
+                if row:
+                    self.db.execute(
+                        "UPDATE books SET status = ?, worker = ?, lease_until = ?, updated = ? "
+                        "WHERE id = ?", (BOOK_RUNNING, worker, now + lease, now, row["id"]))
+                self.db.commit()
+            except BaseException:
+                self.db.rollback()
+                raise
+        if not row:
+            return None
+        book = self._book(row)
+        book["status"] = BOOK_RUNNING
+        return book
+
+    def renew_lease(self, book_id, worker, lease=WORKER_LEASE):
+        """Heartbeat. False, wenn die Lease inzwischen einem anderen Worker gehört."""
+        with self.lock, self.db:
+            cur = self.db.execute(
+                "UPDATE books SET lease_until = ? WHERE id = ? AND worker = ? AND status = ?",
+                (time.time() + lease, book_id, worker, BOOK_RUNNING))
+        return cur.rowcount == 1
+
+    def release_book(self, book_id, worker):
+        """Gibt ein unfertiges Buch (z.B. nach Stopp) für andere Worker frei."""
+        with self.lock, self.db:
+            self.db.execute(
+                "UPDATE books SET status = ?, lease_until = NULL, updated = ? "
+                "WHERE id = ? AND worker = ? AND status != ?",
+                (BOOK_PENDING, time.time(), book_id, worker, BOOK_DONE))
+
+    def active_leases(self):
+        """Anzahl Bücher, die gerade ein (lebender) Worker bearbeitet."""
+        with self.lock:
+            return self.db.execute(
+                "SELECT COUNT(*) FROM books WHERE status = ? AND lease_until >= ?",
+                (BOOK_RUNNING, time.time())).fetchone()[0]
+
+    def remove_books(self, book_ids):
+        with self.lock, self.db:
+            self.db.executemany("DELETE FROM books WHERE id = ?", [(i,) for i in book_ids])
+
+    def clear(self):
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM books")
+
+    def replace_books(self, books):
+        """Ersetzt die ganze Warteliste in einer Transaktion (Warteliste laden)."""
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM books")
+            self._insert_books(books)
+        return books
+
+    # --- Seiten ---
+
+    def set_pages(self, book_id, pages):
+        """
+        Legt die aufgelösten Seiten eines Buches an: [(page_no, fname, url), ...].
+        Bekannte Seiten behalten ihren Zustand, solange sich die URL
+        (z.B. durch ein anderes Profil) nicht geändert hat. False, wenn das
+        Buch nicht (mehr) in der Warteliste steht.
+        """
+        now = time.time()
+        with self.lock, self.db:
+            # Buch inzwischen gelöscht: nichts anlegen statt FOREIGN-KEY-Fehler im Worker
+            if not self.db.execute("SELECT 1 FROM books WHERE id = ?", (book_id,)).fetchone():
+                return False
+            self.db.executemany(
+                "INSERT INTO pages (book_id, page_no, fname, url, state, updated) "
+                "VALUES (?, ?, ?, ?, 'pending', ?) "
+                "ON CONFLICT(book_id, page_no) DO UPDATE SET "
+                "  state = CASE WHEN pages.url = excluded.url AND pages.fname = excluded.fname "
+                "               THEN pages.state ELSE 'pending' END, "
+                "  fname = excluded.fname, url = excluded.url, updated = excluded.updated",
+                [(book_id, no, fname, url, now) for no, fname, url in pages])
+        return True
+
+    def mark_page(self, book_id, page_no, state, size=None, sha256=None, error=None):
+        with self.lock, self.db:
+            self.db.execute(
+                "UPDATE pages SET state = ?, bytes = ?, sha256 = ?, error = ?, updated = ? "
+                "WHERE book_id = ? AND page_no = ?",
+                (state, size, sha256, error, time.time(), book_id, page_no))
+
+    def mark_pages(self, book_id, rows, state):
+        """Mehrere Seiten in einer Transaktion: [(page_no, bytes, sha256), ...]."""
+        now = time.time()
+        with self.lock, self.db:
+            self.db.executemany(
+                "UPDATE pages SET state = ?, bytes = ?, sha256 = ?, error = NULL, updated = ? "
+                "WHERE book_id = ? AND page_no = ?",
+                [(state, size, sha, now, book_id, no) for no, size, sha in rows])
+
+    def pages(self, book_id=None, state=None):
+        """Seiten als dicts, z.B. pages(state=PAGE_FAILED) für alle Fehlschläge."""
+        sql = ("SELECT p.*, b.url AS book_url, b.folder FROM pages p "
+               "JOIN books b ON b.id = p.book_id WHERE 1 = 1")
+        args = []
+        if book_id is not None:
+            sql += " AND p.book_id = ?"
+            args.append(book_id)
+        if state:
+            sql += " AND p.state = ?"
+            args.append(state)
+        with self.lock:
+            rows = self.db.execute(sql + " ORDER BY p.book_id, p.page_no", args).fetchall()
+        return [dict(r) for r in rows]
+
+    def summary(self):
+        """Anzahl Bücher je Status und Seiten je Zustand."""
+        with self.lock:
+            books = dict(self.db.execute("SELECT status, COUNT(*) FROM books GROUP BY status").fetchall())
+            pages = dict(self.db.execute("SELECT state, COUNT(*) FROM pages GROUP BY state").fetchall())
+        return {"books": books, "pages": pages}
+
+
+def catalog_record(folder, url="", title="", place="", type_de="", type_cz="", type_en="",
+                   book_type="", period="", pages=0, material="", source=""):
+    """Katalogeintrag eines Buchordners; Jahre werden aus dem Zeitraum gelesen."""
+    years = re.findall(r"\b\d{4}\b", period or "")
+    return {
+        "folder": os.path.abspath(folder), "url": url, "title": title, "place": place,
+        "type_de": type_de, "type_cz": type_cz, "type_en": type_en, "book_type": book_type,
+        "period": period, "year_from": int(years[0]) if years else None,
+        "year_to": int(years[-1]) if years else None, "pages": int(pages or 0),
+        "material": material, "source": source,
+    }
 
-    return meta
 
+def read_metadata_file(path):
+    """metadata.txt (siehe Downloader._run) -> Katalogeintrag."""
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        text = f.read()
+    head, _, material = text.partition("=== Material / Form (vollständig) ===")
+    fields = {}
+    for line in head.splitlines():
+        key, sep, value = line.partition(": ")
+        if sep:
+            fields[key.strip()] = value.strip()
+    pages = fields.get("Gesamtseiten (gefunden)", "")
+    return catalog_record(
+        os.path.dirname(path), url=fields.get("URL", ""), title=fields.get("Titel", ""),
+        place=fields.get("Ort", ""), type_de=fields.get("Buchtyp (DE)", ""),
+        type_cz=fields.get("Buchtyp (CZ)", ""), type_en=fields.get("Buchtyp (EN)", ""),
+        book_type=fields.get("Roh-Typfeld", ""), period=fields.get("Zeitraum", ""),
+        pages=int(pages) if pages.isdigit() else 0, material=material.strip())
+
+
+class Catalog:
+    """
+    Durchsuchbarer Katalog der heruntergeladenen Bücher (ein Eintrag je
+    Buchordner) in SQLite mit FTS5-Volltextindex über Titel, Ort, Buchtyp
+    und Material-Abschnitt. Der Downloader trägt jedes fertige Buch ein,
+    rebuild() liest vorhandene metadata.txt-Dateien parallel ein. Ohne
+    FTS5 (alte SQLite-Version) wird mit LIKE gesucht.
+    """
 
-def download_image(url, path, session, retries=3):
-    for attempt in range(retries):
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS books (
+            folder    TEXT PRIMARY KEY,
+            url       TEXT NOT NULL DEFAULT '',
+            title     TEXT NOT NULL DEFAULT '',
+            place     TEXT NOT NULL DEFAULT '',
+            type_de   TEXT NOT NULL DEFAULT '',
+            type_cz   TEXT NOT NULL DEFAULT '',
+            type_en   TEXT NOT NULL DEFAULT '',
+            book_type TEXT NOT NULL DEFAULT '',
+            period    TEXT NOT NULL DEFAULT '',
+            year_from INTEGER,
+            year_to   INTEGER,
+            pages     INTEGER NOT NULL DEFAULT 0,
+            material  TEXT NOT NULL DEFAULT '',
+            source    TEXT NOT NULL DEFAULT '',
+            updated   REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS books_years ON books(year_from, year_to);
+    """
+    FTS_SCHEMA = """
+        CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+            title, place, type_de, type_cz, type_en, book_type, material,
+            content='books', tokenize='unicode61 remove_diacritics 2');
+        CREATE TRIGGER IF NOT EXISTS books_ai AFTER INSERT ON books BEGIN
+            INSERT INTO books_fts(rowid, title, place, type_de, type_cz, type_en, book_type, material)
+            VALUES (new.rowid, new.title, new.place, new.type_de, new.type_cz, new.type_en,
+                    new.book_type, new.material);
+        END;
+        CREATE TRIGGER IF NOT EXISTS books_ad AFTER DELETE ON books BEGIN
+            INSERT INTO books_fts(books_fts, rowid, title, place, type_de, type_cz, type_en,
+                                  book_type, material)
+            VALUES ('delete', old.rowid, old.title, old.place, old.type_de, old.type_cz,
+                    old.type_en, old.book_type, old.material);
+        END;
+        CREATE TRIGGER IF NOT EXISTS books_au AFTER UPDATE ON books BEGIN
+            INSERT INTO books_fts(books_fts, rowid, title, place, type_de, type_cz, type_en,
+                                  book_type, material)
+            VALUES ('delete', old.rowid, old.title, old.place, old.type_de, old.type_cz,
+                    old.type_en, old.book_type, old.material);
+            INSERT INTO books_fts(rowid, title, place, type_de, type_cz, type_en, book_type, material)
+            VALUES (new.rowid, new.title, new.place, new.type_de, new.type_cz, new.type_en,
+                    new.book_type, new.material);
+        END;
+    """
+    COLUMNS = ("folder", "url", "title", "place", "type_de", "type_cz", "type_en", "book_type",
+               "period", "year_from", "year_to", "pages", "material", "source")
+    # Spalten für "spalte:wort" in der Suche
+    FTS_COLUMNS = ("title", "place", "type_de", "type_cz", "type_en", "book_type", "material")
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(default_cache_dir(), CATALOG_FILE)
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        version = self.db.execute("PRAGMA user_version").fetchone()[0]
+        if version > CATALOG_DB_VERSION:
+            raise sqlite3.DatabaseError(f"{self.path}: neuere Version ({version})")
+        with self.db:
+            self.db.executescript(self.SCHEMA)
+            self.db.execute(f"PRAGMA user_version={CATALOG_DB_VERSION}")
         try:
-            r = session.get(url, stream=True, timeout=60)
-            r.raise_for_status()
-            with open(path, "wb") as f:
-                for chunk in r.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-            return True
-        except Exception:
-            if attempt == retries - 1:
-                return False
+            with self.db:
+                self.db.executescript(self.FTS_SCHEMA)
+            self.fts = True
+        except sqlite3.OperationalError:
+            self.fts = False
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    def _upsert(self, records):
+        now = time.time()
+        cols = ", ".join(self.COLUMNS)
+        marks = ", ".join("?" for _ in self.COLUMNS)
+        updates = ", ".join(f"{c} = excluded.{c}" for c in self.COLUMNS[1:])
+        self.db.executemany(
+            f"INSERT INTO books ({cols}, updated) VALUES ({marks}, ?) "
+            f"ON CONFLICT(folder) DO UPDATE SET {updates}, updated = excluded.updated",
+            [tuple(r.get(c) for c in self.COLUMNS) + (now,) for r in records])
+
+    def add(self, record):
+        """Ein Buch eintragen bzw. aktualisieren (Schlüssel: Ordner)."""
+        with self.lock, self.db:
+            self._upsert([record])
+
+    def rebuild(self, roots, workers=CATALOG_SCAN_WORKERS, stop_flag=lambda: False, log=None):
+        """
+        Liest alle metadata.txt unter roots ein (Verzeichnisse parallel
+        durchsucht) und aktualisiert die Einträge dieser Ordner. Gelöscht
+        werden nur Einträge, deren Ordner nicht mehr existiert – metadata.txt
+        gibt es nur mit "Log speichern" / -m, der Downloader trägt aber jedes
+        Buch ein. Rückgabe: Anzahl eingelesener Bücher.
+        """
+        log = log or (lambda msg: None)
+        roots = [os.path.abspath(r) for r in roots]
+
+        def scan(top):
+            found = []
+            for dirpath, _, files in os.walk(top):
+                if stop_flag():
+                    break
+                if METADATA_FILE_NAME in files:
+                    path = os.path.join(dirpath, METADATA_FILE_NAME)
+                    try:
+                        found.append(read_metadata_file(path))
+                    except OSError as e:
+                        log(f"[!] {path}: {e}")
+            return found
+
+        # oberste Ebene aufteilen: ein Auftrag je Unterordner (= Ort)
+        records = []
+        tops = []
+        for root in roots:
+            metadata = os.path.join(root, METADATA_FILE_NAME)
+            try:
+                if os.path.exists(metadata):
+                    records.append(read_metadata_file(metadata))
+                with os.scandir(root) as it:
+                    tops.extend(e.path for e in it if e.is_dir(follow_symlinks=False))
+            except OSError as e:
+                log(f"[!] {root}: {e}")
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            for found in pool.map(scan, tops):
+                records.extend(found)
+        if stop_flag():
+            return 0
+
+        with self.lock, self.db:
+            gone = []
+            for root in roots:
+                prefix = root.rstrip(os.sep) + os.sep
+                rows = self.db.execute(
+                    "SELECT folder FROM books WHERE folder = ? OR substr(folder, 1, ?) = ?",
+                    (root, len(prefix), prefix))
+                gone.extend((r["folder"],) for r in rows if not os.path.isdir(r["folder"]))
+            self.db.executemany("DELETE FROM books WHERE folder = ?", gone)
+            self._upsert(records)
+        log(f"[📚] Katalog: {len(records)} Bücher aus {', '.join(roots)} eingelesen, "
+            f"{len(gone)} Einträge gelöschter Ordner entfernt.")
+        return len(records)
+
+    def fts_query(self, text):
+        """Suchtext -> FTS5-Ausdruck: alle Wörter (Präfix), "spalte:wort" für eine Spalte."""
+        terms = []
+        for word in text.split():
+            column, sep, value = word.partition(":")
+            if sep and column in self.FTS_COLUMNS and value:
+                word = value
+            else:
+                column = None
+            word = word.replace('"', '""')
+            term = f'"{word}"*'
+            terms.append(f"{column} : {term}" if column else term)
+        return " ".join(terms)
+
+    def search(self, text="", year_from=None, year_to=None, limit=200):
+        """
+        Bücher zu einem Suchtext (alle Wörter, Präfixsuche, ohne Rücksicht
+        auf Diakritika) und/oder einem Zeitraum, der sich mit dem des Buches
+        überschneidet. Rückgabe: Liste von dicts, sortiert nach Ort / Jahr.
+        """
+        where, params = [], []
+        text = (text or "").strip()
+        if text and self.fts:
+            where.append("b.rowid IN (SELECT rowid FROM books_fts WHERE books_fts MATCH ?)")
+            params.append(self.fts_query(text))
+        elif text:
+            for word in text.split():
+                where.append("(" + " OR ".join(f"b.{c} LIKE ?" for c in self.FTS_COLUMNS) + ")")
+                params.extend([f"%{word.partition(':')[2] or word}%"] * len(self.FTS_COLUMNS))
+        if year_to is not None:
+            where.append("b.year_from <= ?")
+            params.append(int(year_to))
+        if year_from is not None:
+            where.append("COALESCE(b.year_to, b.year_from) >= ?")
+            params.append(int(year_from))
+        sql = f"SELECT b.* FROM books b {'WHERE ' + ' AND '.join(where) if where else ''} " \
+              f"ORDER BY b.place, b.year_from, b.folder LIMIT ?"
+        params.append(int(limit))
+        with self.lock:
+            return [dict(r) for r in self.db.execute(sql, params)]
+
+    def count(self):
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM books").fetchone()[0]
 
 
 class Downloader:
     def __init__(self, books, log_callback=None, progress_callback=None,
-                 stop_flag=lambda: False, save_metadata=False):
+                 stop_flag=lambda: False, save_metadata=False,
+                 page_workers=DEFAULT_PAGE_WORKERS,
+                 max_connections=DEFAULT_MAX_CONNECTIONS,
+                 prefetch_books=DEFAULT_PREFETCH_BOOKS,
+                 manifest_cache=None, log_sink=None, page_store=None,
+                 tiled=TILED_AUTO, profile=DEFAULT_PROFILE, metrics=None, job_store=None,
+                 catalog=None):
         self.books = books
         self.log = log_callback or (lambda msg: None)
         self.progress_update = progress_callback or (lambda idx, val: None)
         self.stop_flag = stop_flag
-        self.session = requests.Session()
-        self.session.headers.update(DEFAULT_HEADERS)
         self.save_metadata = save_metadata
 
+        # globales Limit = Größe des Thread-Pools, pro Buch = Fenstergröße
+        self.max_connections = max(1, int(max_connections))
+        self.page_workers = max(1, min(int(page_workers), self.max_connections))
+        self.prefetch_books = max(0, int(prefetch_books))
+        self.manifest_cache = manifest_cache
+        # optional: zusätzlich download_log.txt im Ordner jedes Buches
+        self.log_sink = log_sink
+        # optional: gemeinsamer Seitenspeicher (Deduplizierung per Hardlink)
+        self.page_store = page_store
+        # Kachel-Download: auto = nur große Karten, always, never
+        self.tiled = tiled if HAVE_PIL else TILED_NEVER
+        # Bandbreiten-Profil (Name oder dict), pro Buch überschreibbar ("profile")
+        self.profile = profile
+        # Zähler / Histogramme des Laufs, siehe metrics_snapshot()
+        self.metrics = metrics or Metrics()
+        # optional: Zustand je Buch / Seite in der SQLite-Warteliste (Bücher mit "id")
+        self.job_store = job_store
+        # optional: jedes fertige Buch im durchsuchbaren Katalog eintragen
+        self.catalog = catalog
+
+        self.session = create_session(self.max_connections)
+        self.controller = HostController(self.max_connections, stop_flag=stop_flag, log=self.log)
+
     def parse_pages(self, pages_str, total):
         if not pages_str.strip():
             return list(range(1, total + 1))
@@ -562,27 +2747,239 @@ class Downloader:
                     pass
         return sorted(set(pages))
 
+    def metrics_snapshot(self):
+        """Aktueller Stand der Metriken inkl. Verbindungslimits je Host."""
+        snap = self.metrics.snapshot()
+        snap["hosts"] = self.controller.snapshot()
+        return snap
+
+    def finish_book(self, idx, book, status):
+        """Status eines Buches anzeigen und (mit job_store) dauerhaft speichern."""
+        self.progress_update(idx, BOOK_STATUS_ICONS[status])
+        if self.job_store and book.get("id") is not None:
+            self.job_store.update_book(book["id"], status=status)
+
+    def log_book(self, outdir, msg):
+        """Logzeile, die zusätzlich im Buch-Log (outdir) landet."""
+        self.log(msg)
+        if self.log_sink:
+            line = f"{datetime.now().strftime('%H:%M:%S')} {msg}"
+            self.log_sink.write(os.path.join(outdir, LOG_FILE_NAME), line)
+
+    def download_page(self, fname, outpath, dl_url, checksums=None, tiled=False, page=None):
+        ok = self._download_page(fname, outpath, dl_url, checksums, tiled)
+        # page = (book_id, page_no) in der SQLite-Warteliste
+        if self.job_store and page:
+            if ok:
+                self.job_store.mark_page(*page, PAGE_DONE, os.path.getsize(outpath),
+                                         (checksums or {}).get(fname))
+            else:
+                self.job_store.mark_page(*page, PAGE_FAILED, error="Download fehlgeschlagen")
+        return ok
+
+    def _download_page(self, fname, outpath, dl_url, checksums=None, tiled=False):
+        outdir = os.path.dirname(outpath)
+        store = self.page_store
+        if checksums is None:
+            checksums = {}
+
+        if store:
+            digest = store.lookup(dl_url)
+            if digest and store.place(digest, outpath):
+                checksums[fname] = digest
+                self.metrics.inc("pages_from_store_total")
+                self.log_book(outdir, f"[♻️] Aus Seitenspeicher: {fname} -> {outpath}")
+                return True
+
+        source = resolve_tiles(dl_url, self.session, self.controller, self.metrics) if tiled else None
+        if source and (self.tiled == TILED_ALWAYS
+                       or TILED_MIN_PIXELS <= source["width"] * source["height"] <= TILED_MAX_PIXELS):
+            self.log_book(outdir, f"Lade {fname} in {len(source['tiles'])} Kacheln "
+                                  f"({source['width']}x{source['height']}) -> {outpath}")
+            try:
+                ok = download_tiled(source, outpath, self.session, self.tile_executor,
+                                    controller=self.controller, checksums=checksums,
+                                    stop_flag=self.stop_flag, metrics=self.metrics)
+            except Exception as e:
+                self.log_book(outdir, f"[!] Kacheln für {fname}: {e}")
+                ok = False
+        else:
+            self.log_book(outdir, f"Lade {fname} -> {outpath}")
+            ok = download_image(dl_url, outpath, self.session, controller=self.controller,
+                                checksums=checksums, metrics=self.metrics)
+        self.metrics.inc("pages_downloaded_total" if ok else "pages_failed_total")
+        if ok and store:
+            try:
+                store.add(dl_url, outpath, checksums[fname])
+            except OSError as e:
+                self.log_book(outdir, f"[!] Seitenspeicher: {e}")
+        return ok
+
+    def update_checksums(self, folder, names, new_sums):
+        """
+        Schreibt checksums.sha256 des Buches: neue Hashes aus dem Download,
+        vorhandene Seiten ohne Eintrag werden parallel nachgehasht.
+        """
+        sums = read_checksums(folder)
+        sums.update(new_sums)
+        missing = [n for n in names
+                   if n not in sums and os.path.isfile(os.path.join(folder, n))]
+        paths = [os.path.join(folder, n) for n in missing]
+        for name, digest in zip(missing, self.executor.map(hash_file, paths)):
+            sums[name] = digest
+        if sums:
+            write_checksums(folder, sums)
+
+    def download_pages(self, jobs):
+        """
+        Lädt die Seiten eines Buches parallel.
+        Höchstens page_workers Seiten sind gleichzeitig unterwegs; bei Stopp
+        werden keine neuen Seiten mehr gestartet. Rückgabe: Anzahl Fehler.
+        """
+        errors = 0
+        pending = set()
+        jobs = iter(jobs)
+
+        while True:
+            while len(pending) < self.page_workers:
+                if self.stop_flag():
+                    break
+                job = next(jobs, None)
+                if job is None:
+                    break
+                pending.add(self.executor.submit(self.download_page, *job))
+
+            if not pending:
+                break
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                try:
+                    ok = fut.result()
+                except Exception:
+                    ok = False
+                if not ok:
+                    errors += 1
+
+        if self.stop_flag() and next(jobs, None) is not None:
+            errors += 1
+
+        return errors
+
+    def resolve_book(self, url):
+        """
+        Lädt die Buchseite und liefert (Bildlinks, Metadaten).
+        Mit manifest_cache werden frische Einträge direkt benutzt und
+        ältere per bedingter Anfrage revalidiert (304 -> Cache).
+        """
+        cache = self.manifest_cache
+        cached = cache.get(url) if cache else None
+        if cached and cache.is_fresh(cached):
+            self.metrics.inc("manifest_cache_hits_total")
+            return cached["links"], cached["meta"]
+
+        # IIIF-Manifest als Buch-URL: keine HTML-Seite
+        if IIIF_MANIFEST_RE.fullmatch(url):
+            started = time.perf_counter()
+            manifest = load_iiif_manifest(url, self.session, self.controller, self.metrics)
+            self.metrics.observe("html_fetch_seconds", time.perf_counter() - started)
+            if not manifest:
+                return [], {"source": "IIIF", "url": url}
+            meta = {"source": "IIIF", "url": url, "title": manifest["label"],
+                    "book_type": "Dokument", "type_de": "Dokument", "type_cz": "Dokument",
+                    "type_en": "Document", "page_sizes": manifest["sizes"]}
+            if cache:
+                cache.put(url, manifest["links"], meta)
+            return manifest["links"], meta
+
+        started = time.perf_counter()
+        r = fetch_page(url, self.session, cache.validators(cached) if cache else None,
+                       controller=self.controller, metrics=self.metrics)
+        html = r.text
+        self.metrics.observe("html_fetch_seconds", time.perf_counter() - started)
+        if r.status_code == 304 and cached:
+            self.metrics.inc("manifest_cache_hits_total")
+            cache.put(url, cached["links"], cached["meta"], r.headers, entry=cached)
+            return cached["links"], cached["meta"]
+
+        # ein Baum für Linksuche und Metadaten
+        started = time.perf_counter()
+        soup = parse_html(html)
+        # IIIF-Manifest (alle Seiten samt Größe) vor dem Suchen im HTML
+        manifest_url = find_iiif_manifest(html, url)
+        manifest = manifest_url and load_iiif_manifest(manifest_url, self.session,
+                                                       self.controller, self.metrics)
+        links = manifest["links"] if manifest else find_iip_links(html, url, soup, self.session)
+
+        if is_porta_fontium(url):
+            meta = parse_pf_metadata(html, url, soup)
+        else:
+            meta = parse_generic_metadata(html, url, soup)
+        if manifest:
+            meta["page_sizes"] = manifest["sizes"]
+            if manifest["label"] and "title" not in meta:
+                meta["title"] = manifest["label"]
+        self.metrics.observe("parse_seconds", time.perf_counter() - started)
+
+        if cache and links:
+            cache.put(url, links, meta, r.headers)
+
+        return links, meta
+
+    def resolved_books(self, resolver):
+        """
+        Liefert (idx, book, future) in Reihenfolge der Warteliste.
+        Während ein Buch heruntergeladen wird, werden die nächsten
+        prefetch_books Bücher bereits im Hintergrund aufgelöst.
+        """
+        window = deque()
+        books = iter(enumerate(self.books))
+
+        while True:
+            while len(window) <= self.prefetch_books:
+                nxt = next(books, None)
+                if nxt is None:
+                    break
+                idx, book = nxt
+                window.append((idx, book, resolver.submit(self.resolve_book, book["url"])))
+
+            if not window:
+                return
+            yield window.popleft()
+
     def run(self):
+        # eigener Pool für Kacheln: Seiten-Worker warten auf ihre Kacheln
+        with ThreadPoolExecutor(max_workers=self.max_connections) as executor, \
+                ThreadPoolExecutor(max_workers=self.max_connections) as tile_executor, \
+                ThreadPoolExecutor(max_workers=self.prefetch_books + 1) as resolver:
+            self.executor = executor
+            self.tile_executor = tile_executor
+            try:
+                self._run(resolver)
+            finally:
+                resolver.shutdown(wait=False, cancel_futures=True)
+                self.metrics.finish()
+
+    def _run(self, resolver):
         total_books = len(self.books)
         books_done = 0
 
-        for idx, book in enumerate(self.books):
+        for idx, book, resolved in self.resolved_books(resolver):
             if self.stop_flag():
                 self.log("[*] Abgebrochen.")
-                self.progress_update(idx, "❌")
+                self.finish_book(idx, book, BOOK_CANCELLED)
                 break
 
             url = book["url"]
+            book_id = book.get("id") if self.job_store else None
+            if book_id is not None and self.job_store.book_status(book_id) is None:
+                # während des Laufs aus der Warteliste gelöscht (GUI): ohne Seitenzustand laden
+                book_id = None
+            if book_id is not None:
+                self.job_store.update_book(book_id, status=BOOK_RUNNING)
 
             try:
-                html = fetch_html(url, self.session)
-                links = find_iip_links(html, url)
-
-                if is_porta_fontium(url):
-                    meta = parse_pf_metadata(html, url)
-                else:
-                    meta = parse_generic_metadata(html, url)
-
+                links, meta = resolved.result()
             except Exception as e:
                 self.log(f"[!] Fehler beim Laden von {url}: {e}")
                 links = []
@@ -590,7 +2987,7 @@ class Downloader:
 
             if not links:
                 self.log(f"[!] Keine Seiten für {url}")
-                self.progress_update(idx, "⚠️")
+                self.finish_book(idx, book, BOOK_PARTIAL)
                 books_done += 1
                 self.progress_update("global", books_done / total_books * 100)
                 continue
@@ -663,25 +3060,38 @@ class Downloader:
                     metadata_lines.append(meta["material_section_text"])
 
                 metadata_text = "\n".join(metadata_lines)
-                meta_file = os.path.join(full_outdir, "metadata.txt")
+                meta_file = os.path.join(full_outdir, METADATA_FILE_NAME)
                 try:
                     with open(meta_file, "w", encoding="utf-8") as f:
                         f.write(metadata_text)
-                    self.log(f"[ℹ️] Metadaten gespeichert: {meta_file}")
+                    self.log_book(full_outdir, f"[ℹ️] Metadaten gespeichert: {meta_file}")
                 except Exception as e:
-                    self.log(f"[!] Fehler beim Schreiben der Metadaten: {e}")
+                    self.log_book(full_outdir, f"[!] Fehler beim Schreiben der Metadaten: {e}")
 
             # --- Seiten downloaden ---
             pages_to_download = self.parse_pages(book.get("pages", ""), len(links))
-            errors = 0
-
+            try:
+                profile = get_profile(book.get("profile") or self.profile)
+            except ValueError as e:
+                self.log(f"[!] {e} – verwende {DEFAULT_PROFILE}")
+                profile = get_profile(DEFAULT_PROFILE)
+            quality = read_page_quality(full_outdir)
+            # vorhandene Seiten zählen nur, wenn sie mindestens im gewünschten Profil vorliegen
+            already_done = {n for n in scan_complete_pages(full_outdir)
+                            if profile_satisfies(quality.get(n), profile)}
+            # Kacheln nur bei voller Auflösung
+            tiled = profile["wid"] is None and (
+                self.tiled == TILED_ALWAYS or (self.tiled == TILED_AUTO and is_map))
+            # Seitengrößen aus dem IIIF-Manifest: über Kacheln je Seite entscheiden,
+            # ohne vorher info.json abzufragen
+            page_sizes = meta.get("page_sizes") or []
+            skipped = 0
+            jobs = []
+            names = []
+            new_sums = {}
+            page_rows = []
+            done_rows = []
             for i in pages_to_download:
-                if self.stop_flag():
-                    errors += 1
-                    break
-
-                link = links[i - 1]
-
                 # Bildnamen
                 if (is_map or is_photo) and title_raw:
                     fname_raw = f"{type_de}_{title_raw}_{i:04d}.jpg"
@@ -689,37 +3099,831 @@ class Downloader:
                     fname_raw = f"{type_triplet}_{i:04d}.jpg"
 
                 fname = sanitize_name(fname_raw)
+                names.append(fname)
                 outpath = os.path.join(full_outdir, fname)
+                dl_url = build_download_url(links[i - 1], profile)
+                page_rows.append((i, fname, dl_url))
+                if fname in already_done:
+                    skipped += 1
+                    done_rows.append((i, fname))
+                    continue
+                page_tiled = tiled
+                if (self.tiled == TILED_AUTO and profile["wid"] is None
+                        and i <= len(page_sizes) and all(page_sizes[i - 1])):
+                    # Größe bekannt: nicht nur Karten, sondern jede große Seite zerlegen
+                    width, height = page_sizes[i - 1]
+                    page_tiled = TILED_MIN_PIXELS <= width * height <= TILED_MAX_PIXELS
+                jobs.append((fname, outpath, dl_url, new_sums, page_tiled,
+                             (book_id, i) if book_id is not None else None))
+
+            self.metrics.inc("pages_skipped_total", skipped)
+            if book_id is not None:
+                # Seitenliste festhalten, vorhandene Seiten gleich als erledigt
+                self.job_store.update_book(book_id, folder=full_outdir)
+                self.job_store.set_pages(book_id, page_rows)
+                sums = read_checksums(full_outdir) if done_rows else {}
+                self.job_store.mark_pages(
+                    book_id, [(i, os.path.getsize(os.path.join(full_outdir, n)), sums.get(n))
+                              for i, n in done_rows], PAGE_DONE)
+            if skipped:
+                self.log_book(full_outdir, f"[ℹ️] {skipped} Seite(n) bereits vorhanden, übersprungen: {full_outdir}")
+
+            errors = self.download_pages(jobs)
 
-                dl_url = build_download_url(link)
-                self.log(f"Lade {fname} -> {outpath}")
-                ok = download_image(dl_url, outpath, self.session)
-                if not ok:
-                    errors += 1
+            try:
+                self.update_checksums(full_outdir, names, new_sums)
+                # welches Profil liegt je Seite vor (Vorschau / aufgewertet)?
+                full = profile_satisfies(profile, DEFAULT_PROFILE)
+                for name in new_sums:
+                    if full:
+                        quality.pop(name, None)
+                    else:
+                        quality[name] = {k: profile[k] for k in ("wid", "q", "iiif_quality")}
+                write_page_quality(full_outdir, quality)
+            except OSError as e:
+                self.log_book(full_outdir, f"[!] Fehler beim Schreiben von Prüfsummen/Seitenprofilen: {e}")
 
             if errors == 0:
-                self.progress_update(idx, "✅")
+                status = BOOK_DONE
             elif errors < len(pages_to_download):
-                self.progress_update(idx, "⚠️")
+                status = BOOK_PARTIAL
             else:
-                self.progress_update(idx, "❌")
+                status = BOOK_FAILED
+            self.finish_book(idx, book, status)
+
+            # fertige / teilweise geladene Bücher in den Katalog
+            if self.catalog and status != BOOK_FAILED:
+                try:
+                    self.catalog.add(catalog_record(
+                        full_outdir, url=url, title=meta.get("title", ""), place=place_raw,
+                        type_de=type_de, type_cz=type_cz, type_en=type_en,
+                        book_type=meta.get("book_type", ""),
+                        period=year_span or meta.get("date_raw", ""), pages=len(links),
+                        material=meta.get("material_section_text", ""),
+                        source=meta.get("source", "")))
+                except sqlite3.Error as e:
+                    self.log_book(full_outdir, f"[!] Katalog: {e}")
 
             books_done += 1
+            self.metrics.inc("books_total")
             self.progress_update("global", books_done / total_books * 100)
 
         self.log("[*] Alle Bücher fertig.")
 
 
+# --- PDF-Export ---
+
+def pdf_page_list(root, images):
+    """[[Name, Größe, Inode, mtime_ns], ...] der Bilder – Grundlage für pdf_is_current."""
+    pages = []
+    for img in images:
+        st = os.stat(os.path.join(root, img))
+        pages.append([img, st.st_size, st.st_ino, st.st_mtime_ns])
+    return pages
+
+
+def pdf_is_current(pdf_path, root, images):
+    """
+    True, wenn das PDF aus genau diesen Bildern gebaut wurde: die beim
+    Export gespeicherte Seitenliste (pdf_path + PDF_PAGES_SUFFIX) stimmt
+    mit dem Ordner überein. PDFs ohne Seitenliste gelten als veraltet.
+    """
+    try:
+        if not os.path.isfile(pdf_path):
+            return False
+        with open(pdf_path + PDF_PAGES_SUFFIX, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        return saved == pdf_page_list(root, images)
+    except (OSError, ValueError):
+        return False
+
+
+def find_pdf_jobs(outdirs):
+    """
+    Sucht alle Ordner mit JPEGs unter outdirs.
+    Rückgabe: (zu exportierende [(root, images)], Anzahl aktueller PDFs)
+    """
+    jobs = []
+    skipped = 0
+    seen = set()
+    for outdir in outdirs:
+        if not outdir or not os.path.isdir(outdir):
+            continue
+        for root, dirs, files in os.walk(outdir):
+            dirs[:] = [d for d in dirs if not d.endswith(TILE_DIR_SUFFIX)]
+            real = os.path.realpath(root)
+            if real in seen:
+                continue
+            seen.add(real)
+
+            images = sorted([f for f in files if f.lower().endswith(".jpg")])
+            if not images:
+                continue
+            pdf_path = os.path.join(root, os.path.basename(root) + ".pdf")
+            if pdf_is_current(pdf_path, root, images):
+                skipped += 1
+                continue
+            jobs.append((root, images))
+    return jobs, skipped
+
+
+def export_folder_pdf(root, images):
+    """
+    Baut das PDF eines Ordners (läuft im Prozess-Pool).
+    Rückgabe: (PDF-Pfad, Liste der Fehlermeldungen)
+    """
+    from PIL import Image
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    pdf_path = os.path.join(root, os.path.basename(root) + ".pdf")
+    tmp_path = pdf_path + ".part"
+    errors = []
+    # vor dem Lesen erfassen: ändert sich ein Bild währenddessen, gilt das PDF als veraltet
+    try:
+        pages = pdf_page_list(root, images)
+    except OSError:
+        pages = None  # Bild fehlt: Fehler meldet die Schleife, keine Seitenliste
+
+    c = canvas.Canvas(tmp_path, pagesize=A4)
+    pdf_w, pdf_h = A4
+
+    for img in images:
+        img_path = os.path.join(root, img)
+        try:
+            with Image.open(img_path) as im:
+                img_w, img_h = im.size
+
+                # Verhältnis bestimmen und beibehalten
+                scale = min(pdf_w / img_w, pdf_h / img_h)
+                new_w = img_w * scale
+                new_h = img_h * scale
+
+                x = (pdf_w - new_w) / 2
+                y = (pdf_h - new_h) / 2
+
+                c.drawImage(img_path, x, y, width=new_w, height=new_h, preserveAspectRatio=True)
+                c.showPage()
+
+        except Exception as e:
+            errors.append(f"{img}: {e}")
+
+    try:
+        c.save()
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    os.replace(tmp_path, pdf_path)
+    # Seitenliste nur für vollständige PDFs, sonst wird beim nächsten Export neu gebaut
+    if pages is not None and not errors:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(pages, f)
+        os.replace(tmp_path, pdf_path + PDF_PAGES_SUFFIX)
+    else:
+        try:
+            os.remove(pdf_path + PDF_PAGES_SUFFIX)
+        except OSError:
+            pass
+    return pdf_path, errors
+
+
+def export_pdfs(outdirs, log=None, progress=None, stop_flag=lambda: False, workers=None):
+    """
+    Exportiert die PDFs aller Ordner parallel in einem Prozess-Pool.
+    progress(fertig, gesamt) wird nach jedem Ordner aufgerufen; bei
+    stop_flag() werden keine weiteren Ordner begonnen.
+    Rückgabe: (exportiert, übersprungen, abgebrochen)
+    """
+    log = log or (lambda msg: None)
+    progress = progress or (lambda done, total: None)
+
+    jobs, skipped = find_pdf_jobs(outdirs)
+    if skipped:
+        log(f"[ℹ️] {skipped} PDF(s) bereits aktuell, übersprungen.")
+    total = len(jobs)
+    done = 0
+    cancelled = False
+    if not jobs:
+        progress(0, 0)
+        return 0, skipped, False
+
+    workers = max(1, min(workers or os.cpu_count() or 1, total))
+    pending = set()
+    jobs = iter(jobs)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while True:
+            while len(pending) < workers and not cancelled:
+                job = next(jobs, None)
+                if job is None:
+                    break
+                pending.add(pool.submit(export_folder_pdf, *job))
+
+            if not pending:
+                break
+
+            finished, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                done += 1
+                try:
+                    pdf_path, errors = fut.result()
+                except Exception as e:
+                    log(f"[!] PDF Fehler: {e}")
+                    continue
+                for err in errors:
+                    log(f"[!] PDF Fehler bei {err}")
+                log(f"[📄] PDF exportiert ({done}/{total}): {pdf_path}")
+            if finished:
+                progress(done, total)
+
+            if not cancelled and stop_flag():
+                cancelled = True
+                log("[*] PDF-Export abgebrochen, laufende Ordner werden beendet ...")
+
+    return done, skipped, cancelled
+
+
+# --- Kommandozeile ---
+
+def run_worker(downloader, job_store, worker_id, stop_flag=lambda: False, log=None,
+               lease=WORKER_LEASE, poll=WORKER_POLL):
+    """
+    Worker-Modus: holt Bücher einzeln aus der gemeinsamen Warteliste
+    (job_store.claim_book) und lädt sie mit downloader. Während ein Buch
+    läuft, verlängert ein Heartbeat die Lease; Bücher abgestürzter Worker
+    werden nach Ablauf ihrer Lease neu vergeben. Endet, wenn kein Buch
+    mehr offen ist und kein anderer Worker mehr arbeitet. Teilweise oder
+    fehlgeschlagene Bücher aus früheren Läufen werden wie ohne --worker
+    einmal neu versucht.
+    Rückgabe: (fertige Bücher, bearbeitete Bücher).
+    """
+    log = log or (lambda msg: None)
+    done = total = 0
+    started = time.time()
+    while not stop_flag():
+        book = job_store.claim_book(worker_id, lease, retry_before=started)
+        if book is None:
+            if not job_store.active_leases():
+                break
+            # andere Worker laufen noch: warten, ob eine Lease abläuft
+            downloader.controller.sleep(poll)
+            continue
+
+        log(f"[*] {worker_id} übernimmt: {book['url']}")
+        beat = threading.Event()
+
+        def heartbeat(book_id=book["id"]):
+            while not beat.wait(lease / 3):
+                if not job_store.renew_lease(book_id, worker_id, lease):
+                    log(f"[!] Lease verloren (anderer Worker übernimmt): {book['url']}")
+                    return
+
+        t = threading.Thread(target=heartbeat, daemon=True)
+        t.start()
+        try:
+            downloader.books = [book]
+            downloader.run()
+        finally:
+            beat.set()
+            t.join()
+
+        if stop_flag():
+            job_store.release_book(book["id"], worker_id)
+            break
+        total += 1
+        done += job_store.book_status(book["id"]) == BOOK_DONE
+    return done, total
+
+
+def iter_url_file(path):
+    """
+    Liest Bücher zeilenweise aus einer Text- oder CSV-Datei (nie die ganze
+    Datei im Speicher). Text: erste URL je Zeile, # = Kommentar.
+    CSV (auch ; / Tab): Spalten url, outdir, pages laut Kopfzeile,
+    sonst die erste Zelle mit URL.
+    """
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        sample = f.read(4096)
+        f.seek(0)
+        dialect = None
+        if path.lower().endswith((".csv", ".tsv")):
+            try:
+                dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+            except csv.Error:
+                dialect = "excel-tab" if path.lower().endswith(".tsv") else "excel"
+
+        if dialect is None:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                m = URL_RE.search(line)
+                if m:
+                    yield {"url": m.group(0)}
+            return
+
+        columns = None
+        for row in csv.reader(f, dialect):
+            cells = [c.strip() for c in row]
+            if columns is None and "url" in (c.lower() for c in cells):
+                columns = {c.lower(): i for i, c in enumerate(cells)}
+                continue
+            if columns:
+                def cell(name):
+                    i = columns.get(name)
+                    return cells[i] if i is not None and i < len(cells) else ""
+
+                if URL_RE.match(cell("url")):
+                    book = {"url": cell("url")}
+                    for key in ("outdir", "pages", "profile"):
+                        if cell(key):
+                            book[key] = cell(key)
+                    yield book
+                continue
+            url = next((c for c in cells if URL_RE.match(c)), None)
+            if url:
+                yield {"url": url}
+
+
+def find_listing_links(html, base_url):
+    """
+    Such-/Bestandsseite von Porta fontium: (Buch-URLs, URL der nächsten
+    Seite oder None). Nächste Seite per rel="next" oder Drupal-Pager.
+    """
+    from bs4 import SoupStrainer
+
+    soup = parse_html(html, parse_only=SoupStrainer(["a", "link", "li"]))
+    host = urlparse(base_url).netloc
+    books = []
+    next_url = None
+    for a in soup.find_all(["a", "link"], href=True):
+        href = urljoin(base_url, a["href"])
+        u = urlparse(href)
+        rel = a.get("rel") or []
+        parent = a.parent if a.name == "a" else None
+        parent_cls = " ".join(parent.get("class", [])) if parent is not None else ""
+        if next_url is None and ("next" in rel or "pager-next" in parent_cls
+                                 or "pager__item--next" in parent_cls):
+            next_url = href
+            continue
+        if u.netloc == host and PF_ITEM_PATH_RE.match(u.path):
+            books.append(href.split("#")[0])
+    return list(dict.fromkeys(books)), next_url
+
+
+def crawl_listing(url, session=None, stop_flag=lambda: False, max_pages=IMPORT_MAX_PAGES):
+    """
+    Folgt der Seitennavigation einer Such-/Bestandsseite und liefert die
+    Buch-URLs nacheinander (Generator: die nächste Seite wird erst geladen,
+    wenn die bisherigen URLs verbraucht sind).
+    """
+    session = session or create_session()
+    seen_pages = set()
+    seen_books = set()
+    while url and url not in seen_pages and len(seen_pages) < max_pages and not stop_flag():
+        seen_pages.add(url)
+        books, url = find_listing_links(fetch_html(url, session), url)
+        for book in books:
+            if book not in seen_books:
+                seen_books.add(book)
+                yield book
+
+
+def iter_import(source, session=None, stop_flag=lambda: False):
+    """Bücher aus einer Datei (Pfad) oder einer Such-/Bestandsseite (URL)."""
+    if URL_RE.match(source):
+        for url in crawl_listing(source, session, stop_flag):
+            yield {"url": url}
+    else:
+        yield from iter_url_file(source)
+
+
+def batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def load_waiting_list(path):
+    """Liest eine Warteliste im Format von DownloaderGUI.save_list."""
+    with open(path, "r", encoding="utf-8") as f:
+        books = json.load(f)
+    if not isinstance(books, list):
+        raise ValueError("Warteliste muss eine JSON-Liste sein")
+    for b in books:
+        if not isinstance(b, dict) or not b.get("url"):
+            raise ValueError(f"Ungültiger Eintrag: {b!r}")
+        b.setdefault("outdir", "")
+        b.setdefault("pages", "")
+    return books
+
+
+def cli_main(argv=None):
+    """
+    Headless-Modus: lädt eine Warteliste (JSON) und/oder URLs ohne GUI.
+    Exit-Codes: 0 = alles ✅, 1 = Fehler/unvollständig, 2 = Aufruffehler,
+    130 = abgebrochen (Strg+C).
+    """
+    import argparse
+
+    ap = argparse.ArgumentParser(
+        prog="portafontium-downloader",
+        description="Porta fontium Downloader ohne GUI (Warteliste oder URLs).")
+    ap.add_argument("urls", nargs="*", metavar="URL", help="Buch-URL(s)")
+    ap.add_argument("-l", "--list", dest="lists", action="append", default=[],
+                    metavar="JSON", help="Warteliste (JSON, wie 'Warteliste speichern')")
+    ap.add_argument("-i", "--import", dest="imports", action="append", default=[],
+                    metavar="DATEI|URL",
+                    help="viele Bücher auf einmal: URL-Liste (Text/CSV) oder Porta-fontium-Such-/"
+                         "Bestandsseite (alle Ergebnisseiten); Doppelte werden übersprungen")
+    ap.add_argument("-o", "--outdir", default="",
+                    help="Zielordner für URLs und Einträge ohne Zielordner (Standard: aktueller Ordner)")
+    ap.add_argument("-p", "--pages", default="", help="Seiten für URLs, z.B. 1,5,8-10 (leer = alle)")
+    ap.add_argument("-w", "--workers", type=int, default=DEFAULT_PAGE_WORKERS,
+                    help=f"parallele Seiten pro Buch (Standard: {DEFAULT_PAGE_WORKERS})")
+    ap.add_argument("-c", "--connections", type=int, default=DEFAULT_MAX_CONNECTIONS,
+                    help=f"parallele Verbindungen insgesamt (Standard: {DEFAULT_MAX_CONNECTIONS})")
+    ap.add_argument("-m", "--metadata", action="store_true", help="metadata.txt je Buch schreiben")
+    ap.add_argument("--no-cache", action="store_true", help="Manifest-Cache nicht benutzen")
+    ap.add_argument("--store", metavar="ORDNER",
+                    help="gemeinsamer Seitenspeicher: jede Seite nur einmal laden, "
+                         "in Buchordner als Hardlink ablegen (gleiches Laufwerk)")
+    ap.add_argument("--log-file", metavar="PFAD", help="gesamtes Log zusätzlich in diese Datei schreiben")
+    ap.add_argument("--book-logs", action="store_true",
+                    help=f"{LOG_FILE_NAME} im Ordner jedes Buches schreiben")
+    ap.add_argument("--profile", choices=list(QUALITY_PROFILES), default=DEFAULT_PROFILE,
+                    help="Bandbreiten-Profil (z.B. erst preview, später full für ausgewählte Seiten)")
+    ap.add_argument("--width", type=int, help="Bildbreite in Pixeln (überschreibt das Profil)")
+    ap.add_argument("--jpeg-quality", type=int, help="JPEG-Qualität 1-100 (überschreibt das Profil)")
+    ap.add_argument("--iiif-quality", choices=("default", "color", "gray", "bitonal"),
+                    help="IIIF-Qualität (überschreibt das Profil)")
+    ap.add_argument("--tiles", choices=(TILED_AUTO, TILED_ALWAYS, TILED_NEVER), default=TILED_AUTO,
+                    help="große Bilder in Kacheln laden (auto = nur große Karten)")
+    ap.add_argument("--verify", action="store_true",
+                    help="vorhandene Seiten prüfen (SHA-256 / JPEG) und nur fehlerhafte neu laden; "
+                         "ohne Bücher wird nur der Zielordner geprüft")
+    ap.add_argument("--jobs", metavar="DB",
+                    help="Warteliste in dieser SQLite-Datei führen: neue Bücher werden angehängt, "
+                         "ohne Bücher werden alle nicht fertigen Bücher fortgesetzt")
+    ap.add_argument("--failed", action="store_true",
+                    help="mit --jobs: fehlgeschlagene Seiten auflisten und beenden")
+    ap.add_argument("--worker", action="store_true",
+                    help="mit --jobs: Bücher einzeln per Lease aus der gemeinsamen Datenbank holen; "
+                         "mehrere Worker (auch auf anderen Rechnern, gemeinsames Laufwerk) teilen sich die Liste")
+    ap.add_argument("--processes", type=int, default=1, metavar="N",
+                    help="mit --worker: N Worker-Prozesse auf diesem Rechner starten")
+    ap.add_argument("--metrics", metavar="PFAD",
+                    help="Laufzeit-Metriken regelmäßig in diese Datei schreiben "
+                         "(*.json als JSON, sonst Prometheus-Textformat)")
+    ap.add_argument("--catalog", metavar="DB",
+                    help=f"Katalog-Datenbank (Standard: {CATALOG_FILE} im Cache-Ordner); "
+                         f"jedes geladene Buch wird eingetragen")
+    ap.add_argument("--no-catalog", action="store_true", help="geladene Bücher nicht im Katalog eintragen")
+    ap.add_argument("--search", nargs="?", const="", metavar="TEXT",
+                    help='Katalog durchsuchen und beenden, z.B. --search "Cheb Sterbe" '
+                         '(alle Wörter, Präfix; "place:Cheb" sucht nur im Ort)')
+    ap.add_argument("--years", metavar="VON-BIS",
+                    help="mit --search: nur Bücher, deren Zeitraum sich damit überschneidet, z.B. 1780-1820")
+    ap.add_argument("--rebuild-catalog", nargs="+", metavar="ORDNER",
+                    help="Katalog aus vorhandenen metadata.txt unter diesen Ordnern neu aufbauen")
+    ap.add_argument("-q", "--quiet", action="store_true", help="nur Buchstatus und Zusammenfassung ausgeben")
+    args = ap.parse_args(argv)
+
+    if args.search is not None or args.rebuild_catalog:
+        return catalog_main(args, ap)
+
+    books = []
+    try:
+        for path in args.lists:
+            books.extend(load_waiting_list(path))
+    except (OSError, ValueError) as e:
+        print(f"[!] Warteliste nicht lesbar: {e}", file=sys.stderr)
+        return 2
+    for b in books:
+        b["outdir"] = b["outdir"] or args.outdir
+    books.extend({"url": u, "outdir": args.outdir, "pages": args.pages} for u in args.urls)
+
+    def imported_books():
+        for source in args.imports:
+            for b in iter_import(source):
+                b["outdir"] = b.get("outdir") or args.outdir
+                b.setdefault("pages", args.pages)
+                yield b
+
+    if args.worker and not args.jobs:
+        ap.print_usage(sys.stderr)
+        print("[!] --worker braucht --jobs.", file=sys.stderr)
+        return 2
+    if args.worker and args.processes > 1:
+        return run_worker_processes(argv, args.processes)
+
+    job_store = None
+    if args.jobs:
+        try:
+            # Worker evtl. auf mehreren Rechnern -> kein WAL (siehe JobStore)
+            job_store = JobStore(args.jobs, wal=not args.worker)
+        except (OSError, sqlite3.Error) as e:
+            print(f"[!] Job-Datenbank nicht nutzbar: {e}", file=sys.stderr)
+            return 2
+        if args.failed:
+            failed = job_store.pages(state=PAGE_FAILED)
+            for p in failed:
+                print(f"{p['book_url']}\t{p['page_no']}\t{p['fname']}\t{p['error'] or ''}")
+            job_store.close()
+            return 1 if failed else 0
+        # schon eingetragene Bücher nicht doppelt anlegen
+        job_store.add_new_books(books)
+        try:
+            # Import direkt in die Datenbank, ohne die ganze Liste im Speicher
+            for batch in batched(imported_books(), IMPORT_BATCH):
+                job_store.add_new_books(batch)
+        except Exception as e:
+            print(f"[!] Import fehlgeschlagen: {e}", file=sys.stderr)
+            return 2
+        books = job_store.books([BOOK_PENDING, BOOK_RUNNING, BOOK_PARTIAL,
+                                 BOOK_FAILED, BOOK_CANCELLED])
+        if not books:
+            print("[*] Alle Bücher der Job-Datenbank sind fertig.")
+            job_store.close()
+            return 0
+    elif args.failed:
+        ap.print_usage(sys.stderr)
+        print("[!] --failed braucht --jobs.", file=sys.stderr)
+        return 2
+    elif args.imports:
+        known = {(b["url"], b["outdir"]) for b in books}
+        try:
+            for b in imported_books():
+                if (b["url"], b["outdir"]) not in known:
+                    known.add((b["url"], b["outdir"]))
+                    books.append(b)
+        except Exception as e:
+            print(f"[!] Import fehlgeschlagen: {e}", file=sys.stderr)
+            return 2
+
+    if not books and not args.verify:
+        ap.print_usage(sys.stderr)
+        print("[!] Keine Bücher angegeben.", file=sys.stderr)
+        return 2
+
+    # Emojis auch auf Konsolen ohne UTF-8 nicht abstürzen lassen
+    for stream in (sys.stdout, sys.stderr):
+        if hasattr(stream, "reconfigure"):
+            stream.reconfigure(errors="replace")
+
+    if args.verify:
+        def verify_log(msg):
+            print(f"{datetime.now().strftime('%H:%M:%S')} {msg}", flush=True)
+
+        if not books:
+            _, bad = verify_tree([args.outdir or os.getcwd()], log=verify_log)
+            return 1 if bad else 0
+        # fehlerhafte Seiten löschen -> der Download lädt nur diese neu
+        roots = list(dict.fromkeys(b["outdir"] or os.getcwd() for b in books))
+        verify_tree(roots, repair=True, log=verify_log)
+
+    if args.worker:
+        # Bücher kommen einzeln per claim_book, siehe run_worker
+        books = []
+
+    status = {}
+    stop = threading.Event()
+
+    log_sink = LogSink() if (args.log_file or args.book_logs) else None
+
+    def log(msg):
+        line = f"{datetime.now().strftime('%H:%M:%S')} {msg}"
+        if not args.quiet:
+            print(line, flush=True)
+        if args.log_file:
+            log_sink.write(args.log_file, line)
+
+    def progress(idx, value):
+        if idx == "global":
+            return
+        if args.worker:
+            print(f"[{worker_id}] {value} {downloader.books[idx]['url']}", flush=True)
+            return
+        status[idx] = value
+        print(f"[{idx + 1}/{len(books)}] {value} {books[idx]['url']}", flush=True)
+
+    manifest_cache = None
+    if not args.no_cache:
+        try:
+            manifest_cache = ManifestCache()
+        except OSError:
+            pass
+
+    catalog = None
+    if not args.no_catalog:
+        try:
+            catalog = Catalog(args.catalog)
+        except (OSError, sqlite3.Error) as e:
+            print(f"[!] Katalog nicht nutzbar: {e}", file=sys.stderr)
+
+    page_store = None
+    if args.store:
+        try:
+            page_store = PageStore(args.store)
+        except OSError as e:
+            print(f"[!] Seitenspeicher nicht nutzbar: {e}", file=sys.stderr)
+            return 2
+
+    profile = dict(QUALITY_PROFILES[args.profile])
+    if args.width:
+        profile["wid"] = args.width
+    if args.jpeg_quality:
+        profile["q"] = max(1, min(100, args.jpeg_quality))
+    if args.iiif_quality:
+        profile["iiif_quality"] = args.iiif_quality
+
+    downloader = Downloader(books, log_callback=log, progress_callback=progress,
+                            stop_flag=stop.is_set, save_metadata=args.metadata,
+                            page_workers=args.workers, max_connections=args.connections,
+                            manifest_cache=manifest_cache,
+                            log_sink=log_sink if args.book_logs else None,
+                            page_store=page_store, tiled=args.tiles, profile=profile,
+                            job_store=job_store, catalog=catalog)
+
+    def dump_metrics():
+        try:
+            write_metrics(args.metrics, downloader.metrics_snapshot())
+        except OSError as e:
+            print(f"[!] Metriken nicht schreibbar: {e}", file=sys.stderr)
+
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    worker_result = []
+    # Event statt Thread.join: ein von Strg+C unterbrochenes join() kann den
+    # Thread fälschlich als beendet melden
+    finished = threading.Event()
+
+    def work():
+        try:
+            if args.worker:
+                worker_result.extend(run_worker(downloader, job_store, worker_id, stop.is_set, log))
+            else:
+                downloader.run()
+        finally:
+            finished.set()
+
+    threading.Thread(target=work, daemon=True).start()
+    next_dump = time.monotonic() + METRICS_WRITE_INTERVAL
+    try:
+        while not finished.wait(0.5):
+            if args.metrics and time.monotonic() >= next_dump:
+                dump_metrics()
+                next_dump = time.monotonic() + METRICS_WRITE_INTERVAL
+    except KeyboardInterrupt:
+        print("[*] Abbruch angefordert, laufende Seiten werden beendet ...", file=sys.stderr)
+        stop.set()
+        finished.wait()
+        return 130
+    finally:
+        if args.metrics:
+            dump_metrics()
+        if log_sink:
+            log_sink.close()
+        if job_store:
+            job_store.close()
+
+    if args.worker:
+        ok, total = worker_result or (0, 0)
+    else:
+        ok = sum(1 for v in status.values() if v == BOOK_STATUS_ICONS[BOOK_DONE])
+        total = len(books)
+    if not args.quiet:
+        print(f"[*] {format_metrics(downloader.metrics_snapshot())}")
+    print(f"[*] {ok}/{total} Bücher vollständig.")
+    return 0 if ok == total else 1
+
+
+def parse_year_range(text):
+    """ "1780-1820" / "1780" -> (von, bis); ValueError bei ungültiger Angabe."""
+    a, _, b = text.strip().partition("-")
+    a = int(a)
+    return (a, int(b)) if b.strip() else (a, a)
+
+
+def catalog_main(args, ap):
+    """--rebuild-catalog / --search: Katalog aufbauen bzw. durchsuchen, ohne Download."""
+    for stream in (sys.stdout, sys.stderr):
+        if hasattr(stream, "reconfigure"):
+            stream.reconfigure(errors="replace")
+    years = (None, None)
+    if args.years:
+        try:
+            years = parse_year_range(args.years)
+        except ValueError:
+            ap.print_usage(sys.stderr)
+            print(f"[!] Ungültiger Zeitraum: {args.years}", file=sys.stderr)
+            return 2
+    try:
+        catalog = Catalog(args.catalog)
+    except (OSError, sqlite3.Error) as e:
+        print(f"[!] Katalog nicht nutzbar: {e}", file=sys.stderr)
+        return 2
+
+    try:
+        if args.rebuild_catalog:
+            catalog.rebuild(args.rebuild_catalog, log=lambda msg: print(msg, file=sys.stderr))
+        if args.search is None:
+            return 0
+        started = time.perf_counter()
+        try:
+            rows = catalog.search(args.search, *years, limit=10 ** 9)
+        except sqlite3.OperationalError as e:
+            print(f"[!] Ungültige Suche: {e}", file=sys.stderr)
+            return 2
+        for r in rows:
+            print(f"{r['place']}\t{r['type_de']}\t{r['period']}\t{r['pages']}\t{r['folder']}\t{r['url']}")
+        if not args.quiet:
+            print(f"[🔎] {len(rows)} Treffer in {(time.perf_counter() - started) * 1000:.1f} ms",
+                  file=sys.stderr)
+        return 0 if rows else 1
+    finally:
+        catalog.close()
+
+
+def run_worker_process(argv):
+    sys.exit(cli_main(argv))
+
+
+def run_worker_processes(argv, processes):
+    """
+    Startet processes Worker (cli_main mit --processes 1) und wartet auf alle.
+    Rückgabe: größter Exit-Code der Worker.
+    """
+    argv = list(sys.argv[1:] if argv is None else argv) + ["--processes", "1"]
+    procs = [multiprocessing.Process(target=run_worker_process, args=(argv,))
+             for _ in range(processes)]
+    for p in procs:
+        p.start()
+    try:
+        for p in procs:
+            p.join()
+    except KeyboardInterrupt:
+        # Strg+C erreicht auch die Worker; sie geben ihre Bücher frei
+        for p in procs:
+            p.join()
+        return 130
+    return max(p.exitcode or 0 for p in procs)
+
+
 # --- GUI ---
 
+def import_gui_modules():
+    """Lädt tkinter erst, wenn die GUI tatsächlich gestartet wird."""
+    global tk, ttk, filedialog, messagebox, simpledialog, webbrowser
+    import tkinter as tk
+    from tkinter import ttk, filedialog, messagebox, simpledialog
+    import webbrowser
+
+
 class DownloaderGUI:
     def __init__(self, master):
+        import_gui_modules()
         self.master = master
         self.lang = "de"
         self.books = []
+        # stabile Schlüssel je Buch (= Treeview-iid), unabhängig von der Position
+        self.books_by_key = {}
+        self.book_status = {}
+        self.key_seq = itertools.count(1)
+        self.view_page = 0
         self.stop_flag = False
+        # Import und PDF-Export haben je ein eigenes Stopp-Ereignis, damit ihr
+        # Start einen laufenden Stopp des Downloads nicht zurücknimmt
+        self.import_stop = threading.Event()
+        self.pdf_stop = threading.Event()
         self.log_open = False
-        self.log_lines = []
+        self.log_lines = deque(maxlen=LOG_MAX_LINES)
+        # Ereignisse aus Worker-Threads (Log / Fortschritt), siehe drain_events
+        self.events = queue.Queue()
+        self.log_sink = LogSink()
+        self.pdf_thread = None
+        self.import_thread = None
+        try:
+            self.manifest_cache = ManifestCache()
+        except OSError:
+            self.manifest_cache = None
+        # Warteliste + Fortschritt überleben Absturz / Neustart (sonst nur im Speicher)
+        try:
+            self.job_store = JobStore()
+        except (OSError, sqlite3.Error):
+            self.job_store = None
+        # durchsuchbarer Katalog aller geladenen Bücher (gleicher wie im CLI-Modus)
+        try:
+            self.catalog = Catalog()
+        except (OSError, sqlite3.Error):
+            self.catalog = None
+        self.catalog_thread = None
 
         master.title(LANG[self.lang]["title"])
         master.geometry("1130x850")
@@ -750,6 +3954,14 @@ class DownloaderGUI:
                            command=self.change_language, bg=DARK_BG, fg=DARK_FG,
                            selectcolor=DARK_BG).pack(side="left")
 
+        self.lbl_profile = tk.Label(top_frame, text=LANG[self.lang]["quality"],
+                                    font=FONT_DEFAULT, bg=DARK_BG, fg=DARK_FG)
+        self.lbl_profile.pack(side="left", padx=(15, 2))
+        self.profile_var = tk.StringVar(value=DEFAULT_PROFILE)
+        self.cmb_profile = ttk.Combobox(top_frame, textvariable=self.profile_var, width=8,
+                                        values=list(QUALITY_PROFILES), state="readonly")
+        self.cmb_profile.pack(side="left")
+
         self.btn_log_toggle = tk.Button(top_frame, text=LANG[self.lang]["log_open"], font=FONT_DEFAULT,
                                         bg="#6c757d", fg="white", command=self.toggle_log)
         self.btn_log_toggle.pack(side="right", padx=5)
@@ -760,6 +3972,12 @@ class DownloaderGUI:
                                            bg=DARK_BG, fg=DARK_FG, selectcolor=DARK_BG)
         self.chk_save_log.pack(side="right", padx=5)
 
+        self.book_log_var = tk.BooleanVar(value=False)
+        self.chk_book_log = tk.Checkbutton(top_frame, text=LANG[self.lang]["book_log"],
+                                           variable=self.book_log_var, font=FONT_DEFAULT,
+                                           bg=DARK_BG, fg=DARK_FG, selectcolor=DARK_BG)
+        self.chk_book_log.pack(side="right", padx=5)
+
         frame_top = tk.Frame(master, bg=DARK_BG)
         frame_top.pack(fill="x", padx=10, pady=5)
 
@@ -837,10 +4055,30 @@ class DownloaderGUI:
                                         font=FONT_DEFAULT, bg="#17a2b8", fg="white",
                                         width=20, command=self.export_pdf)
         self.btn_export_pdf.pack(side="left", padx=5)
-
-        self.lbl_waiting = tk.Label(master, text=LANG[self.lang]["waiting_list"],
+        self.btn_import = tk.Button(save_load_frame, text=LANG[self.lang]["bulk_import"],
+                                    font=FONT_DEFAULT, bg="#6f42c1", fg="white",
+                                    width=20, command=self.bulk_import)
+        self.btn_import.pack(side="left", padx=5)
+        self.btn_catalog = tk.Button(save_load_frame, text=LANG[self.lang]["catalog"],
+                                     font=FONT_DEFAULT, bg="#20c997", fg="white",
+                                     width=20, command=self.open_catalog,
+                                     state="normal" if self.catalog else "disabled")
+        self.btn_catalog.pack(side="left", padx=5)
+
+        waiting_frame = tk.Frame(master, bg=DARK_BG)
+        waiting_frame.pack(fill="x", padx=5)
+        self.lbl_waiting = tk.Label(waiting_frame, text=LANG[self.lang]["waiting_list"],
                                     font=FONT_DEFAULT, bg=DARK_BG, fg=DARK_FG)
-        self.lbl_waiting.pack(anchor="w", padx=5)
+        self.lbl_waiting.pack(side="left")
+        # Blättern in der Warteliste (nur VIEW_PAGE_SIZE Zeilen im Treeview)
+        self.btn_page_next = tk.Button(waiting_frame, text="▶", font=FONT_DEFAULT, bg="#6c757d",
+                                       fg="white", command=lambda: self.show_page(self.view_page + 1))
+        self.btn_page_next.pack(side="right")
+        self.lbl_view_page = tk.Label(waiting_frame, text="", font=FONT_DEFAULT, bg=DARK_BG, fg=DARK_FG)
+        self.lbl_view_page.pack(side="right", padx=5)
+        self.btn_page_prev = tk.Button(waiting_frame, text="◀", font=FONT_DEFAULT, bg="#6c757d",
+                                       fg="white", command=lambda: self.show_page(self.view_page - 1))
+        self.btn_page_prev.pack(side="right")
         frame_list = tk.Frame(master, bg=DARK_BG)
         frame_list.pack(fill="both", expand=True, padx=5, pady=5)
 
@@ -860,6 +4098,12 @@ class DownloaderGUI:
 
         self.tree.bind("<Double-1>", self.open_book_url)
 
+        # gespeicherte Warteliste mit letztem Status wiederherstellen
+        if self.job_store:
+            self.set_books(self.job_store.books())
+        else:
+            self.show_page(0)
+
         self.lbl_progress = tk.Label(master, text=LANG[self.lang]["global_progress"],
                                      font=FONT_DEFAULT, bg=DARK_BG, fg=DARK_FG)
         self.lbl_progress.pack(anchor="w", padx=5)
@@ -871,14 +4115,80 @@ class DownloaderGUI:
                                               font=FONT_DEFAULT, bg=DARK_BG, fg=DARK_FG)
         self.global_progress_label.pack(side="left", padx=5)
 
+        # Statuszeile mit Laufzeit-Metriken des aktuellen Downloads
+        self.downloader = None
+        self.lbl_stats = tk.Label(master, text="", font=("Consolas", 10),
+                                  bg=DARK_BG, fg="#aaaaaa", anchor="w")
+        self.lbl_stats.pack(fill="x", padx=5)
+
         self.log_frame = tk.Frame(master, bg=DARK_BG)
         self.log_text = tk.Text(self.log_frame, height=12, font=("Consolas", 10),
                                 bg="#111111", fg="#dddddd", insertbackground=DARK_FG)
         self.log_text.pack(fill="both", expand=True)
 
+        master.after(UI_POLL_MS, self.drain_events)
+        master.after(STATS_POLL_MS, self.update_stats)
+        master.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    def on_close(self):
+        # gepufferte Logs vor dem Beenden schreiben
+        self.log_sink.close()
+        if self.job_store:
+            self.job_store.close()
+        if self.catalog:
+            self.catalog.close()
+        self.master.destroy()
+
     def open_home(self):
         webbrowser.open("https://www.portafontium.eu/searching")
 
+    # --- Warteliste (Schlüssel -> Buch, Treeview zeigt eine Seite) ---
+
+    def register_books(self, books):
+        for b in books:
+            # mit SQLite-Warteliste ist die Datenbank-ID der Schlüssel
+            key = str(b["id"]) if "id" in b else f"n{next(self.key_seq)}"
+            b["key"] = key
+            self.books_by_key[key] = b
+            self.book_status[key] = BOOK_STATUS_ICONS.get(b.get("status"), "⏳")
+
+    def set_books(self, books):
+        """Ersetzt die ganze Warteliste (laden / zurücksetzen)."""
+        self.books = list(books)
+        self.books_by_key = {}
+        self.book_status = {}
+        self.register_books(self.books)
+        self.show_page(0)
+
+    def append_books(self, books):
+        first = len(self.books)
+        self.books.extend(books)
+        self.register_books(books)
+        # nur neu zeichnen, wenn die neuen Bücher auf der sichtbaren Seite landen
+        if first < (self.view_page + 1) * VIEW_PAGE_SIZE:
+            self.show_page(self.view_page)
+        else:
+            self.update_page_label()
+
+    def page_count(self):
+        return max(1, -(-len(self.books) // VIEW_PAGE_SIZE))
+
+    def show_page(self, page):
+        self.view_page = max(0, min(page, self.page_count() - 1))
+        self.tree.delete(*self.tree.get_children())
+        start = self.view_page * VIEW_PAGE_SIZE
+        for b in self.books[start:start + VIEW_PAGE_SIZE]:
+            self.tree.insert("", "end", iid=b["key"],
+                             values=(b["url"], b.get("pages", ""), self.book_status[b["key"]]))
+        self.update_page_label()
+
+    def update_page_label(self):
+        self.lbl_view_page.config(text=LANG[self.lang]["view_page"].format(
+            page=self.view_page + 1, pages=self.page_count(), count=len(self.books)))
+
+    def selected_books(self):
+        return [self.books_by_key[iid] for iid in self.tree.selection() if iid in self.books_by_key]
+
     def open_book_url(self, event):
         item = self.tree.identify_row(event.y)
         if not item:
@@ -903,21 +4213,67 @@ class DownloaderGUI:
         self.log_open = not self.log_open
 
     def log(self, msg):
+        # threadsicher: nur einreihen, angezeigt wird in drain_events
         line = f"{datetime.now().strftime('%H:%M:%S')} {msg}"
-        self.log_lines.append(line)
-        self.log_text.insert("end", line + "\n")
+        self.events.put(("log", line))
+
+    def drain_events(self):
+        """
+        Läuft im Tk-Mainloop: holt gesammelte Ereignisse ab, fügt Logzeilen
+        in einem Rutsch ein und wendet je Zeile nur den letzten Status an.
+        """
+        lines = []
+        progress = {}
+        calls = []
+        try:
+            for _ in range(UI_MAX_EVENTS_PER_TICK):
+                kind, *payload = self.events.get_nowait()
+                if kind == "log":
+                    lines.append(payload[0])
+                elif kind == "call":
+                    calls.append(payload[0])
+                else:
+                    idx, value = payload
+                    progress[idx] = value
+        except queue.Empty:
+            pass
+
+        try:
+            if lines:
+                self.show_log_lines(lines)
+            for idx, value in progress.items():
+                self.apply_progress(idx, value)
+            for fn in calls:
+                fn()
+        finally:
+            self.master.after(UI_POLL_MS, self.drain_events)
+
+    def update_stats(self):
+        # liest nur den Snapshot (threadsicher), auch nach Ende des Laufs
+        try:
+            if self.downloader:
+                self.lbl_stats.config(text=format_metrics(self.downloader.metrics_snapshot(),
+                                                          LANG[self.lang]["stats"]))
+        finally:
+            self.master.after(STATS_POLL_MS, self.update_stats)
+
+    def show_log_lines(self, lines):
+        # ins Textfeld nur die letzten LOG_MAX_LINES, ins Logfile alle Zeilen
+        shown = lines[-LOG_MAX_LINES:]
+        self.log_lines.extend(shown)
+        self.log_text.insert("end", "\n".join(shown) + "\n")
+
+        # Textfeld als Ringpuffer: älteste Zeilen verwerfen
+        excess = int(self.log_text.index("end-1c").split(".")[0]) - 1 - LOG_MAX_LINES
+        if excess > 0:
+            self.log_text.delete("1.0", f"{excess + 1}.0")
         self.log_text.see("end")
 
-        # globales Logfile im Zielordner (optional)
+        # globales Logfile im Zielordner (optional, gepuffert im Hintergrund)
         if self.save_log_var.get() and self.books:
             outdir = self.books[0].get("outdir", "")
             if outdir and os.path.isdir(outdir):
-                logfile = os.path.join(outdir, "download_log.txt")
-                try:
-                    with open(logfile, "a", encoding="utf-8") as f:
-                        f.write(line + "\n")
-                except Exception:
-                    pass
+                self.log_sink.write(os.path.join(outdir, LOG_FILE_NAME), lines)
 
     def add_book(self):
         url = self.url_entry.get().strip()
@@ -929,8 +4285,9 @@ class DownloaderGUI:
         if not outdir:
             outdir = os.getcwd()
         book = {"url": url, "outdir": outdir, "pages": pages}
-        self.books.append(book)
-        self.tree.insert("", "end", values=(url, pages, "⏳"))
+        if self.job_store:
+            self.job_store.add_books([book])
+        self.append_books([book])
         self.log(f"[+] Buch hinzugefügt: {url}")
 
         # Eingabefelder zurücksetzen
@@ -941,37 +4298,40 @@ class DownloaderGUI:
         self.url_entry.focus_set()
 
     def delete_book(self):
-        sel = self.tree.selection()
-        if not sel:
+        removed = self.selected_books()
+        if not removed:
             messagebox.showwarning(LANG[self.lang]["title"], LANG[self.lang]["error_no_selection"])
             return
-        for item in reversed(sel):
-            idx = self.tree.index(item)
-            del self.books[idx]
-            self.tree.delete(item)
+        keys = {b["key"] for b in removed}
+        # ein Durchlauf statt pop() je Zeile
+        self.books = [b for b in self.books if b["key"] not in keys]
+        for key in keys:
+            del self.books_by_key[key]
+            self.book_status.pop(key, None)
+        if self.job_store:
+            self.job_store.remove_books([b["id"] for b in removed if "id" in b])
+        self.show_page(self.view_page)
         self.log("[-] Buch gelöscht.")
 
     def change_pages(self):
-        sel = self.tree.selection()
+        sel = self.selected_books()
         if not sel:
             messagebox.showwarning(LANG[self.lang]["title"], LANG[self.lang]["error_no_selection"])
             return
-        item = sel[0]
-        idx = self.tree.index(item)
-        current_pages = self.books[idx]["pages"]
+        book = sel[0]
         pages = simpledialog.askstring(LANG[self.lang]["change_pages"], LANG[self.lang]["pages_hint"],
-                                       initialvalue=current_pages)
+                                       initialvalue=book.get("pages", ""))
         if pages is not None:
-            self.books[idx]["pages"] = pages
-            values = list(self.tree.item(item, "values"))
-            values[1] = pages
-            self.tree.item(item, values=values)
-            self.log(f"[~] Seiten geändert: {self.books[idx]['url']} -> {pages}")
+            book["pages"] = pages
+            if self.job_store and "id" in book:
+                self.job_store.update_book(book["id"], pages=pages)
+            self.tree.set(book["key"], "pages", pages)
+            self.log(f"[~] Seiten geändert: {book['url']} -> {pages}")
 
     def reset_books(self):
-        self.books.clear()
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        if self.job_store:
+            self.job_store.clear()
+        self.set_books([])
         self.log("[*] Warteliste zurückgesetzt.")
 
     def save_list(self):
@@ -980,21 +4340,151 @@ class DownloaderGUI:
         file = filedialog.asksaveasfilename(defaultextension=".json",
                                             filetypes=[("JSON", "*.json")])
         if file:
+            # interne Felder der SQLite-Warteliste nicht exportieren
+            books = [{k: v for k, v in b.items() if k not in ("id", "status", "key")}
+                     for b in self.books]
             with open(file, "w", encoding="utf-8") as f:
-                json.dump(self.books, f, indent=2, ensure_ascii=False)
+                json.dump(books, f, indent=2, ensure_ascii=False)
             self.log(f"[💾] Warteliste gespeichert: {file}")
 
     def load_list(self):
         file = filedialog.askopenfilename(filetypes=[("JSON", "*.json")])
         if file:
             with open(file, "r", encoding="utf-8") as f:
-                self.books = json.load(f)
-            for item in self.tree.get_children():
-                self.tree.delete(item)
-            for b in self.books:
-                self.tree.insert("", "end", values=(b["url"], b.get("pages", ""), "⏳"))
+                books = json.load(f)
+            if self.job_store:
+                self.job_store.replace_books(books)
+            self.set_books(books)
             self.log(f"[📂] Warteliste geladen: {file}")
 
+    def bulk_import(self):
+        """
+        Such-/Bestandsseite im URL-Feld -> alle Ergebnisseiten durchsuchen,
+        sonst URL-Liste (Text/CSV) wählen. Läuft im Hintergrund, die Bücher
+        erscheinen blockweise in der Warteliste.
+        """
+        if self.import_thread and self.import_thread.is_alive():
+            messagebox.showwarning(LANG[self.lang]["title"], LANG[self.lang]["import_running"])
+            return
+        source = self.url_entry.get().strip()
+        if URL_RE.match(source):
+            self.url_entry.delete(0, "end")
+        else:
+            source = filedialog.askopenfilename(filetypes=[("URL", "*.txt *.csv *.tsv"),
+                                                           ("*", "*.*")])
+            if not source:
+                return
+        outdir = self.outdir_entry.get().strip() or os.getcwd()
+        pages = self.pages_entry.get().strip()
+        self.import_stop = threading.Event()
+        self.import_thread = threading.Thread(target=self.run_import,
+                                              args=(source, outdir, pages, self.import_stop),
+                                              daemon=True)
+        self.import_thread.start()
+
+    def run_import(self, source, outdir, pages, stop):
+        known = {(b["url"], b.get("outdir", "")) for b in list(self.books)}
+        added = skipped = 0
+        self.log(f"[📥] Import gestartet: {source}")
+        try:
+            for batch in batched(iter_import(source, stop_flag=stop.is_set), IMPORT_BATCH):
+                new = []
+                for b in batch:
+                    b["outdir"] = b.get("outdir") or outdir
+                    b.setdefault("pages", pages)
+                    key = (b["url"], b["outdir"])
+                    if key in known:
+                        skipped += 1
+                        continue
+                    known.add(key)
+                    new.append(b)
+                if self.job_store:
+                    self.job_store.add_books(new)
+                added += len(new)
+                self.call_in_gui(lambda new=new: self.append_books(new))
+                self.log(f"[📥] {added} Bücher importiert ...")
+                if stop.is_set():
+                    break
+        except Exception as e:
+            self.log(f"[!] Import fehlgeschlagen: {e}")
+        self.log(f"[📥] Import beendet: {added} neu, {skipped} doppelt übersprungen.")
+
+    # --- Katalog ---
+
+    def open_catalog(self):
+        """Fenster zum Durchsuchen des Katalogs (Suchtext und/oder Zeitraum)."""
+        L = LANG[self.lang]
+        win = tk.Toplevel(self.master)
+        win.title(L["catalog"])
+        win.geometry("1000x600")
+        win.configure(bg=DARK_BG)
+
+        top = tk.Frame(win, bg=DARK_BG)
+        top.pack(fill="x", padx=5, pady=5)
+        query = tk.Entry(top, width=40, font=FONT_DEFAULT,
+                         bg="#2b2b2b", fg=DARK_FG, insertbackground=DARK_FG)
+        query.pack(side="left", padx=5)
+        tk.Label(top, text=L["catalog_years"], font=FONT_DEFAULT,
+                 bg=DARK_BG, fg=DARK_FG).pack(side="left")
+        years = tk.Entry(top, width=12, font=FONT_DEFAULT,
+                         bg="#2b2b2b", fg=DARK_FG, insertbackground=DARK_FG)
+        years.pack(side="left", padx=5)
+
+        columns = ("place", "type", "period", "pages", "folder")
+        tree = ttk.Treeview(win, columns=columns, show="headings", selectmode="browse")
+        for col, key, width in (("place", "col_place", 150), ("type", "col_type", 150),
+                                ("period", "col_period", 90), ("pages", "col_pages", 60),
+                                ("folder", "col_folder", 500)):
+            tree.heading(col, text=L[key])
+            tree.column(col, width=width, anchor="w" if col in ("place", "type", "folder") else "center")
+        lbl_hits = tk.Label(win, text="", font=("Consolas", 10), bg=DARK_BG, fg="#aaaaaa", anchor="w")
+
+        def search(_=None):
+            try:
+                span = parse_year_range(years.get()) if years.get().strip() else (None, None)
+                started = time.perf_counter()
+                rows = self.catalog.search(query.get(), *span, limit=VIEW_PAGE_SIZE)
+            except (ValueError, sqlite3.Error) as e:
+                lbl_hits.config(text=f"[!] {e}")
+                return
+            type_key = {"de": "type_de", "en": "type_en", "cs": "type_cz"}[self.lang]
+            tree.delete(*tree.get_children())
+            for r in rows:
+                tree.insert("", "end", values=(r["place"], r[type_key], r["period"],
+                                               r["pages"], r["folder"]))
+            lbl_hits.config(text=L["catalog_hits"].format(
+                count=len(rows), ms=(time.perf_counter() - started) * 1000))
+
+        def open_folder(_=None):
+            from urllib.request import pathname2url
+            sel = tree.selection()
+            if sel:
+                webbrowser.open(urljoin("file:", pathname2url(tree.set(sel[0], "folder"))))
+
+        tk.Button(top, text=L["catalog_search"], font=FONT_DEFAULT, bg="#007bff", fg="white",
+                  command=search).pack(side="left", padx=5)
+        tk.Button(top, text=L["catalog_rebuild"], font=FONT_DEFAULT, bg="#6c757d", fg="white",
+                  command=self.rebuild_catalog).pack(side="right", padx=5)
+        lbl_hits.pack(fill="x", padx=5)
+        tree.pack(fill="both", expand=True, padx=5, pady=5)
+        query.bind("<Return>", search)
+        years.bind("<Return>", search)
+        tree.bind("<Double-1>", open_folder)
+        query.focus_set()
+        search()
+
+    def rebuild_catalog(self):
+        """Vorhandene metadata.txt eines Ordners in den Katalog einlesen (im Hintergrund)."""
+        if self.catalog_thread and self.catalog_thread.is_alive():
+            messagebox.showwarning(LANG[self.lang]["title"], LANG[self.lang]["catalog_running"])
+            return
+        folder = filedialog.askdirectory(initialdir=self.outdir_entry.get().strip() or os.getcwd())
+        if not folder:
+            return
+        self.catalog_thread = threading.Thread(target=self.catalog.rebuild, args=([folder],),
+                                               kwargs={"log": self.log}, daemon=True)
+        self.catalog_thread.start()
+
     def export_pdf(self):
         if not self.books:
             messagebox.showwarning(LANG[self.lang]["title"], LANG[self.lang]["pdf_error_no_books"])
@@ -1002,47 +4492,31 @@ class DownloaderGUI:
         if not HAVE_REPORTLAB:
             messagebox.showerror(LANG[self.lang]["title"], LANG[self.lang]["pdf_error_lib"])
             return
+        if self.pdf_thread and self.pdf_thread.is_alive():
+            messagebox.showwarning(LANG[self.lang]["title"], LANG[self.lang]["pdf_running"])
+            return
 
-        from PIL import Image
-
-        for book in self.books:
-            outdir = book.get("outdir", "")
-            if not outdir or not os.path.isdir(outdir):
-                continue
-
-            for root, dirs, files in os.walk(outdir):
-                images = sorted([f for f in files if f.lower().endswith(".jpg")])
-                if not images:
-                    continue
-
-                pdf_path = os.path.join(root, os.path.basename(root) + ".pdf")
-                c = canvas.Canvas(pdf_path, pagesize=A4)
-                pdf_w, pdf_h = A4
-
-                for img in images:
-                    img_path = os.path.join(root, img)
-                    try:
-                        with Image.open(img_path) as im:
-                            img_w, img_h = im.size
-
-                            # Verhältnis bestimmen und beibehalten
-                            scale = min(pdf_w / img_w, pdf_h / img_h)
-                            new_w = img_w * scale
-                            new_h = img_h * scale
-
-                            x = (pdf_w - new_w) / 2
-                            y = (pdf_h - new_h) / 2
-
-                            c.drawImage(img_path, x, y, width=new_w, height=new_h, preserveAspectRatio=True)
-                            c.showPage()
-
-                    except Exception as e:
-                        self.log(f"[!] PDF Fehler bei {img}: {e}")
+        # läuft im Hintergrund, abbrechbar über den Stopp-Button
+        self.global_progress["value"] = 0
+        self.global_progress_label.config(text="0%")
+        self.pdf_stop = threading.Event()
+        outdirs = [book.get("outdir", "") for book in self.books]
+        self.pdf_thread = threading.Thread(target=self.run_pdf_thread, args=(outdirs, self.pdf_stop),
+                                           daemon=True)
+        self.pdf_thread.start()
 
-                c.save()
-                self.log(f"[📄] PDF exportiert: {pdf_path}")
+    def run_pdf_thread(self, outdirs, stop):
+        def progress(done, total):
+            self.update_progress("global", done / total * 100 if total else 100)
 
-        messagebox.showinfo(LANG[self.lang]["title"], LANG[self.lang]["pdf_saved"])
+        try:
+            _, _, cancelled = export_pdfs(outdirs, log=self.log, progress=progress,
+                                          stop_flag=stop.is_set)
+        except Exception as e:
+            self.log(f"[!] PDF Fehler: {e}")
+            return
+        key = "pdf_cancelled" if cancelled else "pdf_saved"
+        self.call_in_gui(lambda: messagebox.showinfo(LANG[self.lang]["title"], LANG[self.lang][key]))
 
     def start_books(self):
         if not self.books:
@@ -1054,30 +4528,51 @@ class DownloaderGUI:
         threading.Thread(target=self.run_books_thread, daemon=True).start()
 
     def stop_download(self):
+        # Stopp-Button beendet Download, Import und PDF-Export
         self.stop_flag = True
+        self.import_stop.set()
+        self.pdf_stop.set()
+
+    def call_in_gui(self, fn):
+        # fn wird im Tk-Mainloop ausgeführt (z.B. Dialoge aus Worker-Threads)
+        self.events.put(("call", fn))
 
     def update_progress(self, idx, value):
+        # threadsicher: nur einreihen, angewendet wird in drain_events
+        self.events.put(("progress", idx, value))
+
+    def apply_progress(self, idx, value):
         if idx == "global":
             self.global_progress["value"] = value
             self.global_progress_label.config(text=f"{int(value)}%")
-        else:
-            try:
-                item = self.tree.get_children()[idx]
-            except Exception:
-                return
-            values = list(self.tree.item(item, "values"))
-            values[2] = value
-            self.tree.item(item, values=values)
+        elif idx in self.books_by_key:
+            # idx ist hier der Buch-Schlüssel (siehe run_books_thread)
+            self.book_status[idx] = value
+            if self.tree.exists(idx):
+                self.tree.set(idx, "status", value)
 
     def run_books_thread(self):
+        # eigene Liste: Löschen / Hinzufügen während des Laufs verschiebt keine Indizes
+        books = list(self.books)
+
+        def progress(idx, value):
+            self.update_progress(idx if idx == "global" else books[idx]["key"], value)
+
         downloader = Downloader(
-            self.books,
+            books,
             log_callback=self.log,
-            progress_callback=self.update_progress,
+            progress_callback=progress,
             stop_flag=lambda: self.stop_flag,
-            save_metadata=self.save_log_var.get()
+            save_metadata=self.save_log_var.get(),
+            manifest_cache=self.manifest_cache,
+            log_sink=self.log_sink if self.book_log_var.get() else None,
+            profile=self.profile_var.get(),
+            job_store=self.job_store,
+            catalog=self.catalog
         )
+        self.downloader = downloader
         downloader.run()
+        self.log_sink.flush()
 
     def change_language(self, _=None):
         self.lang = self.lang_var.get()
@@ -1095,19 +4590,34 @@ class DownloaderGUI:
         self.btn_save_list.config(text=L["save_list"])
         self.btn_load_list.config(text=L["load_list"])
         self.btn_export_pdf.config(text=L["export_pdf"])
+        self.btn_import.config(text=L["bulk_import"])
+        self.btn_catalog.config(text=L["catalog"])
         self.chk_save_log.config(text=L["save_log"])
+        self.chk_book_log.config(text=L["book_log"])
+        self.lbl_profile.config(text=L["quality"])
         self.lbl_url.config(text=L["book_url"])
         self.lbl_outdir.config(text=L["target_dir"])
         self.lbl_pages.config(text=L["pages"])
         self.lbl_pages_hint.config(text=L["pages_hint"])
         self.lbl_waiting.config(text=L["waiting_list"])
+        self.update_page_label()
         self.lbl_progress.config(text=L["global_progress"])
         self.tree.heading("book", text=L["col_book"])
         self.tree.heading("pages", text=L["col_pages"])
         self.tree.heading("status", text=L["col_status"])
 
 
-if __name__ == "__main__":
+def run_gui():
+    import_gui_modules()
     root = tk.Tk()
-    app = DownloaderGUI(root)
+    DownloaderGUI(root)
     root.mainloop()
+
+
+if __name__ == "__main__":
+    # nötig für den Prozess-Pool (PDF-Export) in der PyInstaller-EXE
+    multiprocessing.freeze_support()
+    # mit Argumenten -> Kommandozeilenmodus, sonst GUI
+    if len(sys.argv) > 1:
+        sys.exit(cli_main())
+    run_gui()